@@ -0,0 +1,119 @@
+"""Model backends behind inference.py and serve.py.
+
+A backend turns log lines into model outputs. ``generate_batch(texts)``
+returns one output per text; ``generate(texts)`` yields outputs for any
+iterable of lines, in order, and is what the pipeline stages wrap. The base
+class cuts the stream into ``batch_size`` batches; backends that batch
+continuously (llama.cpp) override it.
+
+Each backend module imports its model library only when it is loaded, so
+``--help`` and the mock backend start without torch, ONNX Runtime, vLLM or
+llama.cpp.
+"""
+
+from __future__ import annotations
+
+import argparse
+import importlib
+from array import array
+from collections import Counter, defaultdict
+from collections.abc import Callable, Iterable, Iterator
+from functools import partial
+from itertools import islice
+
+SYSTEM_PROMPT = (
+    "You are a log parser. Extract all key-value fields from the input log line, "
+    "one per line, in the format: key value"
+)
+
+BUCKET_WINDOW = 64  # batches' worth of lines sorted by length together
+
+# --backend name -> (module in this package, backend class)
+BACKENDS = {
+    "llama.cpp": ("llama_cpp", "LlamaCppBackend"),
+    "cascade": ("cascade", "CascadeBackend"),
+    "transformers": ("hf", "HFBackend"),
+    "vllm": ("vllm", "VLLMBackend"),
+    "seq2seq": ("seq2seq", "Seq2SeqBackend"),
+    "onnx": ("ort", "ORTBackend"),
+    "mock": ("mock", "MockBackend"),
+}
+
+
+class Backend:
+    """Base class: batched generation over a stream of log lines."""
+
+    batch_size = 1
+
+    def __init__(self) -> None:
+        self.stats = Counter()
+        self.timings = defaultdict(partial(array, "d"))
+
+    def generate_batch(self, texts: list[str]) -> list[str]:
+        raise NotImplementedError
+
+    def generate(self, texts: Iterable[str]) -> Iterator[str]:
+        """Yield one output per text, in input order."""
+        texts = iter(texts)
+        while batch := list(islice(texts, self.batch_size)):
+            yield from self.generate_batch(batch)
+
+    def fits(self, text: str) -> bool:
+        """Whether ``text`` can be parsed in one generation (see line_chunks.py)."""
+        return True
+
+    def pretokenize(self, text: str) -> None:
+        """Prepare ``text`` ahead of generation; called from the reader thread."""
+
+
+def generate_bucketed(
+    texts: Iterable[str],
+    encode: Callable[[str], list[int]],
+    run: Callable[[list[list[int]]], list[str]],
+    batch_size: int,
+) -> Iterator[str]:
+    """Yield ``run`` outputs for padded batches, in input order.
+
+    Lines are encoded in windows of BUCKET_WINDOW batches and each window is
+    sorted by encoded length, so every batch pads to nearly the same length.
+    """
+    texts = iter(texts)
+    while window := list(islice(texts, batch_size * BUCKET_WINDOW)):
+        encoded = [encode(text) for text in window]
+        order = sorted(range(len(window)), key=lambda i: len(encoded[i]), reverse=True)
+        outputs: list[str] = [""] * len(window)
+        for start in range(0, len(order), batch_size):
+            batch = order[start : start + batch_size]
+            for i, output in zip(batch, run([encoded[i] for i in batch])):
+                outputs[i] = output
+        yield from outputs
+
+
+# Option values that count as not set: the CLI defaults, and for --temperature
+# also 0, which greedy-only backends implement exactly.
+UNSET_VALUES = {"precision": ("fp32",), "temperature": (0.1, 0.0)}
+
+
+def reject_options(args: argparse.Namespace, *names: str) -> None:
+    """Raise ValueError if any of the backend-specific options ``names`` is set.
+
+    An option is set when it is truthy, or for the options in UNSET_VALUES,
+    when it holds none of the listed values.
+    """
+    used = [
+        f"--{name.replace('_', '-')}"
+        for name in names
+        if (getattr(args, name) not in UNSET_VALUES[name] if name in UNSET_VALUES else getattr(args, name))
+    ]
+    if used:
+        raise ValueError(f"{', '.join(used)} not supported by the {args.backend} backend")
+
+
+def load_backend(args: argparse.Namespace, n_threads: int | None = None) -> Backend:
+    """Import and construct the backend selected by ``--backend``.
+
+    Raises ValueError for options the backend does not support.
+    """
+    module_name, class_name = BACKENDS[args.backend]
+    module = importlib.import_module(f"{__name__}.{module_name}")
+    return getattr(module, class_name)(args, n_threads)
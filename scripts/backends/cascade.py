@@ -0,0 +1,101 @@
+"""Confidence-gated cascade of two GGUF models on llama.cpp.
+
+The small model (--model) parses every line. Lines whose output it is
+unsure of are parsed again by the large model (--escalate-model), in one
+batched pass per window of lines, so the large model's latency is paid only
+where it is likely to change the answer.
+"""
+
+from __future__ import annotations
+
+import argparse
+import math
+import re
+import time
+from collections.abc import Iterable, Iterator
+from itertools import islice
+
+from backends import Backend, reject_options
+from span_pointers import decode_target
+from targets import SUMMARY_KEY
+
+CASCADE_WINDOW = 16  # batches' worth of lines the small model parses before each escalation pass
+PAIR_RE = re.compile(r"[^\s@]\S* \S.*")
+
+
+def confidence(text: str, output: str, logprobs: list[float]) -> float:
+    """Score in [0, 1] for the small model's output on ``text``.
+
+    It is the geometric-mean probability of the generated tokens times the
+    share of values found verbatim in the line. The score is 0 unless the
+    output is structurally valid: unique ``key value`` lines followed by
+    exactly one ``@ summary`` line.
+    """
+    lines = output.strip().split("\n")
+    pairs, summary = lines[:-1], lines[-1]
+    if not summary.startswith(f"{SUMMARY_KEY} ") or not all(PAIR_RE.fullmatch(line) for line in pairs):
+        return 0.0
+    keys = [line.split(" ", 1)[0] for line in pairs]
+    if len(set(keys)) < len(keys) or not logprobs:
+        return 0.0
+    values = [line.split(" ", 1)[1] for line in pairs]
+    grounded = sum(value in text for value in values) / len(values) if values else 1.0
+    return math.exp(sum(logprobs) / len(logprobs)) * grounded
+
+
+class CascadeBackend(Backend):
+    """Small model first; lines scoring below --escalate-below go to the large model.
+
+    Both engines add into one set of stats, so token counts and budget
+    retries cover both passes. Per-line timings are the small model's.
+    """
+
+    def __init__(self, args: argparse.Namespace, n_threads: int | None = None) -> None:
+        # Imported here so confidence() can be used without llama-cpp-python.
+        from backends.llama_cpp import load_engine
+
+        super().__init__()
+        reject_options(args, "compile", "precision")
+        if not args.escalate_model:
+            raise ValueError("--escalate-model is required by the cascade backend")
+        self.small = load_engine(args, args.parallel, n_threads)
+        self.large = load_engine(argparse.Namespace(**(vars(args) | {"model": args.escalate_model})), args.parallel, n_threads)
+        self.large.stats = self.stats = self.small.stats
+        self.timings = self.small.timings
+        self.batch_size = args.parallel
+        self.threshold = args.escalate_below
+        self.span_pointers = args.span_pointers
+
+    @property
+    def budget_ratio(self) -> float | None:
+        return self.small.budget_ratio
+
+    def fits(self, text: str) -> bool:
+        return self.small.fits(text) and self.large.fits(text)
+
+    def pretokenize(self, text: str) -> None:
+        self.small.pretokenize(text)
+
+    def generate_batch(self, texts: list[str]) -> list[str]:
+        return list(self.generate(texts))
+
+    def generate(self, texts: Iterable[str]) -> Iterator[str]:
+        texts = iter(texts)
+        while window := list(islice(texts, self.batch_size * CASCADE_WINDOW)):
+            start = time.perf_counter()
+            outputs, escalate = [], []
+            for i, (text, (output, logprobs)) in enumerate(zip(window, self.small.generate_with_logprobs(window))):
+                outputs.append(output)
+                # Span-pointer targets hold offsets; check the values they point at.
+                values = decode_target(text, output) if self.span_pointers else output
+                if confidence(text, values, logprobs) < self.threshold:
+                    escalate.append(i)
+            escalated_at = time.perf_counter()
+            for i, output in zip(escalate, self.large.generate(window[i] for i in escalate)):
+                outputs[i] = output
+            self.large.timings.clear()  # per-line timings cover the small model only
+            self.stats["cascade_lines"] += len(window)
+            self.stats["cascade_escalated"] += len(escalate)
+            self.stats["cascade_small_seconds"] += escalated_at - start
+            self.stats["cascade_large_seconds"] += time.perf_counter() - escalated_at
+            yield from outputs
@@ -0,0 +1,133 @@
+"""Hugging Face checkpoints on transformers, in length-bucketed padded batches.
+
+Tuned for CPU hosts, where it is the fallback when a GGUF export fails:
+``--compile`` decodes on a static KV cache with a torch.compile'd decode
+step, and ``--precision`` selects bf16 or dynamic int8 weights.
+"""
+
+from __future__ import annotations
+
+import argparse
+import contextlib
+import sys
+import time
+from collections.abc import Iterable, Iterator
+
+import torch
+from transformers import AutoModelForCausalLM, AutoTokenizer, CompileConfig, StaticCache
+
+from backends import SYSTEM_PROMPT, Backend, generate_bucketed, reject_options
+
+CACHE_ALIGN = 256  # static KV cache lengths are rounded up to a multiple of this
+WARMUP_TOKENS = 4
+
+
+def cpu_supports_bf16() -> bool:
+    try:
+        return torch.ops.mkldnn._is_mkldnn_bf16_supported()
+    except (AttributeError, RuntimeError):
+        return False
+
+
+class HFBackend(Backend):
+    """Left-padded, length-bucketed batches of ``--parallel`` prompts through ``model.generate``."""
+
+    def __init__(self, args: argparse.Namespace, n_threads: int | None = None) -> None:
+        super().__init__()
+        reject_options(args, "grammar", "kv_size", "budget_ratio", "fit_budget")
+        if args.draft and args.parallel != 1:
+            raise ValueError("--draft decodes one prompt at a time on transformers; use --parallel 1")
+        if args.draft and args.compile:
+            raise ValueError("--draft changes the decode step shape; it cannot run with --compile")
+        if n_threads:
+            torch.set_num_threads(n_threads)
+        self.batch_size = args.parallel
+        self.n_ctx = args.n_ctx
+        self.max_tokens = args.max_tokens
+        self.temperature = args.temperature
+        self.n_draft = args.draft
+        self.compile = args.compile
+        self.precision = args.precision
+        if self.precision == "bf16" and not cpu_supports_bf16():
+            print("This CPU has no native bf16 support; running in fp32.", file=sys.stderr)
+            self.precision = "fp32"
+
+        self.tokenizer = AutoTokenizer.from_pretrained(args.model)
+        self.tokenizer.padding_side = "left"  # every prompt must end where generation starts
+        if self.tokenizer.pad_token is None:
+            self.tokenizer.pad_token = self.tokenizer.eos_token
+        # A static KV cache holds a single dtype, so bf16 needs bf16 weights and
+        # not just autocast: rotary embeddings keep the keys in fp32 otherwise.
+        dtype = torch.bfloat16 if self.precision == "bf16" else torch.float32
+        self.model = AutoModelForCausalLM.from_pretrained(args.model, dtype=dtype)
+        if self.precision == "int8":
+            self.model = torch.ao.quantization.quantize_dynamic(self.model, {torch.nn.Linear}, dtype=torch.qint8)
+        if self.compile:
+            # generate() compiles the single-token decode step when it runs on a
+            # static cache; dynamic shapes keep cache length changes from
+            # recompiling it. Prefill stays eager.
+            self.model.generation_config.compile_config = CompileConfig(mode="default", dynamic=True)
+            self.model.generation_config.compile_config._compile_all_devices = True  # CPU is opt-in
+            start = time.perf_counter()
+            self._generate([self.render("warm-up")] * self.batch_size, WARMUP_TOKENS, min_new_tokens=WARMUP_TOKENS)
+            self.stats.clear()
+            self.stats["warmup_seconds"] = time.perf_counter() - start
+        if self.n_draft:
+            # Every forward pass yields one token the model picked itself; any extra
+            # generated tokens are accepted prompt-lookup drafts.
+            def count_forward(module, inputs, output) -> None:
+                self.stats["forward_passes"] += 1
+
+            self.model.register_forward_hook(count_forward)
+
+    def render(self, text: str) -> list[int]:
+        """Token ids of the chat prompt for one log line."""
+        messages = [
+            {"role": "system", "content": SYSTEM_PROMPT},
+            {"role": "user", "content": text},
+        ]
+        prompt = self.tokenizer.apply_chat_template(messages, add_generation_prompt=True, tokenize=False)
+        return self.tokenizer(prompt, add_special_tokens=False)["input_ids"]
+
+    def fits(self, text: str) -> bool:
+        return len(self.render(text)) + self.max_tokens <= self.n_ctx
+
+    def _generate(self, prompts: list[list[int]], max_tokens: int, **overrides) -> list[str]:
+        """Decode tokenized prompts together, left-padded to a common length."""
+        rows = len(prompts)
+        if self.compile:
+            # A short batch would recompile the decode step; fill it with repeats.
+            prompts = prompts + prompts[-1:] * (self.batch_size - rows)
+        inputs = self.tokenizer.pad({"input_ids": prompts}, padding=True, return_tensors="pt")
+        kwargs = {
+            "max_new_tokens": max_tokens,
+            "do_sample": self.temperature > 0,
+            "temperature": self.temperature or None,
+            "pad_token_id": self.tokenizer.pad_token_id,
+            "prompt_lookup_num_tokens": self.n_draft or None,
+        } | overrides
+        if self.compile:
+            length = -(-(inputs["input_ids"].shape[1] + max_tokens) // CACHE_ALIGN) * CACHE_ALIGN
+            kwargs["past_key_values"] = StaticCache(config=self.model.config, max_cache_len=length)
+        autocast = (
+            torch.autocast("cpu", dtype=torch.bfloat16) if self.precision == "bf16" else contextlib.nullcontext()
+        )
+        start = time.perf_counter()
+        with autocast:
+            output_ids = self.model.generate(**inputs, **kwargs)
+        self.stats["generate_seconds"] += time.perf_counter() - start
+        generated = output_ids[:rows, inputs["input_ids"].shape[1] :]
+        # Rows that stop early are filled with padding after their first EOS.
+        eos_ids = self.model.generation_config.eos_token_id
+        eos = torch.isin(generated, torch.tensor([] if eos_ids is None else eos_ids, dtype=torch.long)).int()
+        self.stats["generated_tokens"] += generated.numel() - int(((eos.cumsum(1) - eos) > 0).sum())
+        return self.tokenizer.batch_decode(generated, skip_special_tokens=True)
+
+    def _generate_prompts(self, prompts: list[list[int]]) -> list[str]:
+        return self._generate(prompts, self.max_tokens)
+
+    def generate_batch(self, texts: list[str]) -> list[str]:
+        return self._generate_prompts([self.render(text) for text in texts])
+
+    def generate(self, texts: Iterable[str]) -> Iterator[str]:
+        return generate_bucketed(texts, self.render, self._generate_prompts, self.batch_size)
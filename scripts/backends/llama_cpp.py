@@ -0,0 +1,95 @@
+"""GGUF models on llama.cpp, decoded with continuous batching (gguf_engine.py)."""
+
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import sys
+from collections.abc import Iterable, Iterator
+from itertools import islice
+
+from backends import SYSTEM_PROMPT, Backend, reject_options
+from gguf_engine import BatchEngine
+
+# GBNF for the target format: `key value` lines closed by one `@ summary` line.
+# Once the summary line is complete only end-of-generation is allowed, which
+# bounds runaway outputs that would otherwise run to --max-tokens.
+TARGET_GRAMMAR = r"""
+root    ::= pair* summary
+pair    ::= key " " [^\n]* "\n"
+key     ::= [^ \t\r\n@] [^ \t\r\n]*
+summary ::= "@ " [^\n]{0,200}
+"""
+BUDGET_QUANTILE = 0.95  # share of training examples whose output fits the fitted ratio
+FIT_SAMPLE = 10_000  # training examples read when fitting the output budget
+
+
+def load_engine(args: argparse.Namespace, n_parallel: int, n_threads: int | None = None) -> BatchEngine:
+    with open(os.devnull, "w") as devnull:
+        old_stderr = sys.stderr
+        sys.stderr = devnull
+        try:
+            engine = BatchEngine(
+                args.model,
+                SYSTEM_PROMPT,
+                n_parallel=n_parallel,
+                n_ctx=args.n_ctx,
+                kv_size=args.kv_size,
+                n_threads=n_threads,
+                max_tokens=args.max_tokens,
+                temperature=args.temperature,
+                grammar=TARGET_GRAMMAR if args.grammar else None,
+                budget_ratio=args.budget_ratio,
+                n_draft=args.draft,
+            )
+        finally:
+            sys.stderr = old_stderr
+    if args.fit_budget:
+        engine.budget_ratio = fit_budget_ratio(engine, args.fit_budget)
+    return engine
+
+
+def fit_budget_ratio(engine: BatchEngine, path: str) -> float:
+    """Output tokens per input token that covers BUDGET_QUANTILE of a training split.
+
+    ``path`` is source/text/target JSONL, as consumed by transform_to_chat_format.py.
+    """
+    ratios = []
+    with open(path) as f:
+        for line in islice(f, FIT_SAMPLE):
+            entry = json.loads(line)
+            n_out = engine.count_tokens(entry["target"]) + 1  # plus end of generation
+            ratios.append(n_out / max(engine.count_tokens(entry["text"]), 1))
+    if not ratios:
+        raise ValueError(f"{path} has no training examples to fit the output budget on")
+    ratios.sort()
+    return ratios[min(len(ratios) - 1, int(len(ratios) * BUDGET_QUANTILE))]
+
+
+class LlamaCppBackend(Backend):
+    """Wraps a BatchEngine; its stats and timings are the engine's own."""
+
+    def __init__(self, args: argparse.Namespace, n_threads: int | None = None) -> None:
+        # Torch-only options; a GGUF file fixes its own quantisation.
+        reject_options(args, "compile", "precision")
+        self.engine = load_engine(args, args.parallel, n_threads)
+        self.stats = self.engine.stats
+        self.timings = self.engine.timings
+        self.batch_size = args.parallel
+
+    @property
+    def budget_ratio(self) -> float | None:
+        return self.engine.budget_ratio
+
+    def generate_batch(self, texts: list[str]) -> list[str]:
+        return list(self.engine.generate(texts))
+
+    def generate(self, texts: Iterable[str]) -> Iterator[str]:
+        return self.engine.generate(texts)
+
+    def fits(self, text: str) -> bool:
+        return self.engine.fits(text)
+
+    def pretokenize(self, text: str) -> None:
+        self.engine.pretokenize(text)
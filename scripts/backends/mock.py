@@ -0,0 +1,34 @@
+"""Deterministic stand-in model for tests and pipeline benchmarks; loads nothing."""
+
+from __future__ import annotations
+
+import argparse
+import re
+import time
+
+from backends import Backend
+
+PAIR_RE = re.compile(r"([A-Za-z_][\w.-]*)[=:]\s*(\S+)")
+
+
+class MockBackend(Backend):
+    """Emits a ``key value`` line per ``key=value`` or ``key: value`` in the
+    input, then ``@ <first 40 characters>``, so outputs depend only on the
+    input. ``--mock-latency`` sleeps that many seconds per batch."""
+
+    def __init__(self, args: argparse.Namespace, n_threads: int | None = None) -> None:
+        super().__init__()
+        self.batch_size = args.parallel
+        self.latency = args.mock_latency
+
+    def generate_batch(self, texts: list[str]) -> list[str]:
+        if self.latency:
+            time.sleep(self.latency)
+        self.stats["mock_batches"] += 1
+        return [parse(text) for text in texts]
+
+
+def parse(text: str) -> str:
+    lines = [f"{key} {value}" for key, value in PAIR_RE.findall(text)]
+    lines.append(f"@ {text[:40]}")
+    return "\n".join(lines)
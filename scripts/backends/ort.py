@@ -0,0 +1,172 @@
+"""Seq2seq checkpoints exported by export_onnx.py, on ONNX Runtime.
+
+Same input and output contract as the seq2seq backend, and the same greedy
+decoding, but without PyTorch at run time: ``--model`` is the export
+directory with ``encoder.onnx``, ``decoder_with_past.onnx``, the config and
+the tokenizer. Whether the weights are int8 is decided at export time
+(``export_onnx.py --int8``).
+
+transformers imports torch, which would cost most of the load time and
+memory saved, so tokenization does without it: ByT5 is a byte codec, and
+SentencePiece T5 checkpoints use the exported ``tokenizer.json``.
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import re
+import time
+from collections.abc import Iterable, Iterator
+
+import numpy as np
+import onnxruntime as ort
+
+from backends import Backend, generate_bucketed, reject_options
+
+BYTE_OFFSET = 3  # <pad>, </s> and <unk> come before the 256 byte ids
+EOS_ID = 1
+
+
+class ByteTokenizer:
+    """ByT5's tokenizer: UTF-8 bytes offset past the special ids.
+
+    Added tokens written in the text (``<extra_id_N>``, ``</s>``, ...) map to
+    their ids, eating surrounding whitespace where the tokenizer config says
+    so, as the transformers tokenizer does.
+    """
+
+    def __init__(self, config_path: str) -> None:
+        with open(config_path) as f:
+            added = json.load(f)["added_tokens_decoder"]
+        self.ids = {token["content"]: int(i) for i, token in added.items()}
+        self.byte_end = BYTE_OFFSET + 256
+        patterns = [
+            (r"\s*" if token["lstrip"] else "") + re.escape(token["content"]) + (r"\s*" if token["rstrip"] else "")
+            for token in sorted(added.values(), key=lambda token: -len(token["content"]))
+        ]
+        self.added_re = re.compile("|".join(f"({pattern})" for pattern in patterns))
+
+    def encode(self, text: str) -> list[int]:
+        ids: list[int] = []
+        position = 0
+        for match in self.added_re.finditer(text):
+            ids.extend(b + BYTE_OFFSET for b in text[position : match.start()].encode())
+            ids.append(self.ids[match[0].strip()])
+            position = match.end()
+        ids.extend(b + BYTE_OFFSET for b in text[position:].encode())
+        ids.append(EOS_ID)
+        return ids
+
+    def decode(self, ids: list[int]) -> str:
+        data = bytes(i - BYTE_OFFSET for i in ids if BYTE_OFFSET <= i < self.byte_end)
+        return data.decode("utf-8", errors="ignore")
+
+
+class JSONTokenizer:
+    """A ``tokenizer.json`` saved by a fast tokenizer (SentencePiece T5)."""
+
+    def __init__(self, path: str) -> None:
+        from tokenizers import Tokenizer
+
+        self.tokenizer = Tokenizer.from_file(path)
+
+    def encode(self, text: str) -> list[int]:
+        return self.tokenizer.encode(text).ids
+
+    def decode(self, ids: list[int]) -> str:
+        return self.tokenizer.decode(ids, skip_special_tokens=True)
+
+
+def load_tokenizer(model_dir: str) -> ByteTokenizer | JSONTokenizer:
+    path = os.path.join(model_dir, "tokenizer.json")
+    if os.path.exists(path):
+        return JSONTokenizer(path)
+    return ByteTokenizer(os.path.join(model_dir, "tokenizer_config.json"))
+
+
+class ORTBackend(Backend):
+    """Batched greedy decoding over the exported encoder and decoder-with-past graphs.
+
+    The encoder graph returns every decoder layer's cross-attention keys and
+    values, so each step only projects the new token. Finished rows are
+    dropped from the cache, the cross-attention inputs and the mask, as in
+    the seq2seq backend. A ``--temperature`` other than the default or 0 is
+    rejected, since there is no sampling.
+    """
+
+    def __init__(self, args: argparse.Namespace, n_threads: int | None = None) -> None:
+        super().__init__()
+        reject_options(args, "grammar", "kv_size", "budget_ratio", "fit_budget", "compile", "draft", "temperature")
+        if args.precision != "fp32":
+            raise ValueError("--precision is fixed at export time for the onnx backend (export_onnx.py --int8)")
+        self.batch_size = args.parallel
+        self.n_ctx = args.n_ctx
+        self.max_tokens = args.max_tokens
+
+        with open(os.path.join(args.model, "config.json")) as f:
+            config = json.load(f)
+        self.start_id = config["decoder_start_token_id"]
+        self.eos_id = config["eos_token_id"]
+        self.n_layers = config.get("num_decoder_layers") or config["num_layers"]
+        self.kv_shape = (config["num_heads"], 0, config["d_kv"])
+        self.pad_id = config["pad_token_id"]
+        self.tokenizer = load_tokenizer(args.model)
+
+        options = ort.SessionOptions()
+        if n_threads:
+            options.intra_op_num_threads = n_threads
+        providers = ["CPUExecutionProvider"]
+        self.encoder = ort.InferenceSession(os.path.join(args.model, "encoder.onnx"), options, providers=providers)
+        self.decoder = ort.InferenceSession(
+            os.path.join(args.model, "decoder_with_past.onnx"), options, providers=providers
+        )
+        self.cross_names = [output.name for output in self.encoder.get_outputs()]
+        self.past_names = [f"past_{kind}_{i}" for i in range(self.n_layers) for kind in ("key", "value")]
+
+    def encode(self, text: str) -> list[int]:
+        return self.tokenizer.encode(text)
+
+    def fits(self, text: str) -> bool:
+        return len(self.encode(text)) <= self.n_ctx
+
+    def _decode(self, input_ids: list[list[int]]) -> list[str]:
+        start = time.perf_counter()
+        width = max(map(len, input_ids))
+        ids = np.full((len(input_ids), width), self.pad_id, dtype=np.int64)
+        mask = np.zeros((len(input_ids), width), dtype=np.int64)
+        for row, encoded in enumerate(input_ids):
+            ids[row, : len(encoded)] = encoded
+            mask[row, : len(encoded)] = 1
+        cross = self.encoder.run(None, {"input_ids": ids, "attention_mask": mask})
+        past = [np.zeros((len(input_ids), *self.kv_shape), dtype=np.float32) for _ in self.past_names]
+
+        rows = np.arange(len(input_ids))  # original row of each batch entry still decoding
+        outputs: list[list[int]] = [[] for _ in input_ids]
+        next_ids = np.full((len(input_ids), 1), self.start_id, dtype=np.int64)
+        for _ in range(self.max_tokens):
+            feed = {"input_ids": next_ids, "encoder_attention_mask": mask}
+            feed.update(zip(self.past_names, past))
+            feed.update(zip(self.cross_names, cross))
+            logits, *past = self.decoder.run(None, feed)
+            tokens = logits.argmax(-1)
+            for row, token in zip(rows.tolist(), tokens.tolist()):
+                outputs[row].append(token)
+            self.stats["generated_tokens"] += len(rows)
+            running = tokens != self.eos_id
+            if not running.all():
+                if not running.any():
+                    break
+                rows, tokens, mask = rows[running], tokens[running], mask[running]
+                past = [kv[running] for kv in past]
+                cross = [kv[running] for kv in cross]
+            next_ids = tokens[:, None]
+        self.stats["generate_seconds"] += time.perf_counter() - start
+        return [self.tokenizer.decode(output) for output in outputs]
+
+    def generate_batch(self, texts: list[str]) -> list[str]:
+        return self._decode([self.encode(text) for text in texts])
+
+    def generate(self, texts: Iterable[str]) -> Iterator[str]:
+        return generate_bucketed(texts, self.encode, self._decode, self.batch_size)
@@ -0,0 +1,102 @@
+"""Encoder-decoder checkpoints (the autotrain ByT5/T5 seq2seq models) on PyTorch.
+
+These models take the raw log line as input, with no chat prompt, and emit
+the target directly. Byte-level inputs are long, so batches are
+length-bucketed, the encoder runs once per batch, and greedy decoding
+drops rows from the batch as soon as they emit EOS.
+"""
+
+from __future__ import annotations
+
+import argparse
+import sys
+import time
+from collections.abc import Iterable, Iterator
+
+import torch
+from transformers import AutoModelForSeq2SeqLM, AutoTokenizer, DynamicCache, EncoderDecoderCache
+
+from backends import Backend, generate_bucketed, reject_options
+from backends.hf import cpu_supports_bf16
+
+
+class Seq2SeqBackend(Backend):
+    """Batched greedy decoding with a cached decoder state.
+
+    Each step feeds only the last token of every unfinished row. Finished
+    rows are removed from the decoder cache, the encoder states and the
+    attention mask, so long outputs in a batch do not keep paying for short
+    ones. The batch stops when every row has emitted EOS or
+    ``--max-tokens`` is reached. A ``--temperature`` other than the default
+    or 0 is rejected, since there is no sampling.
+    """
+
+    def __init__(self, args: argparse.Namespace, n_threads: int | None = None) -> None:
+        super().__init__()
+        reject_options(args, "grammar", "kv_size", "budget_ratio", "fit_budget", "compile", "draft", "temperature")
+        if n_threads:
+            torch.set_num_threads(n_threads)
+        self.batch_size = args.parallel
+        self.n_ctx = args.n_ctx
+        self.max_tokens = args.max_tokens
+        precision = args.precision
+        if precision == "bf16" and not cpu_supports_bf16():
+            print("This CPU has no native bf16 support; running in fp32.", file=sys.stderr)
+            precision = "fp32"
+
+        self.tokenizer = AutoTokenizer.from_pretrained(args.model)
+        dtype = torch.bfloat16 if precision == "bf16" else torch.float32
+        self.model = AutoModelForSeq2SeqLM.from_pretrained(args.model, dtype=dtype).eval()
+        if precision == "int8":
+            self.model = torch.ao.quantization.quantize_dynamic(self.model, {torch.nn.Linear}, dtype=torch.qint8)
+        self.encoder = self.model.get_encoder()
+        self.start_id = self.model.config.decoder_start_token_id
+        self.eos_id = self.model.config.eos_token_id
+        self.pad_id = self.model.config.pad_token_id
+
+    def encode(self, text: str) -> list[int]:
+        return self.tokenizer(text)["input_ids"]
+
+    def fits(self, text: str) -> bool:
+        return len(self.encode(text)) <= self.n_ctx
+
+    @torch.inference_mode()
+    def _decode(self, input_ids: list[list[int]]) -> list[str]:
+        start = time.perf_counter()
+        inputs = self.tokenizer.pad({"input_ids": input_ids}, padding=True, return_tensors="pt")
+        mask = inputs["attention_mask"]
+        encoder_states = self.encoder(input_ids=inputs["input_ids"], attention_mask=mask).last_hidden_state
+        cache = EncoderDecoderCache(DynamicCache(), DynamicCache())
+
+        rows = torch.arange(len(input_ids))  # original row of each batch entry still decoding
+        outputs: list[list[int]] = [[] for _ in input_ids]
+        next_ids = torch.full((len(input_ids), 1), self.start_id)
+        for _ in range(self.max_tokens):
+            logits = self.model(
+                encoder_outputs=(encoder_states,),
+                attention_mask=mask,
+                decoder_input_ids=next_ids,
+                past_key_values=cache,
+                use_cache=True,
+            ).logits
+            tokens = logits[:, -1].argmax(-1)
+            for row, token in zip(rows.tolist(), tokens.tolist()):
+                outputs[row].append(token)
+            self.stats["generated_tokens"] += len(rows)
+            running = tokens != self.eos_id
+            if not running.all():
+                if not running.any():
+                    break
+                keep = running.nonzero().squeeze(1)
+                rows, tokens = rows[keep], tokens[keep]
+                encoder_states, mask = encoder_states[keep], mask[keep]
+                cache.batch_select_indices(keep)
+            next_ids = tokens[:, None]
+        self.stats["generate_seconds"] += time.perf_counter() - start
+        return self.tokenizer.batch_decode(outputs, skip_special_tokens=True)
+
+    def generate_batch(self, texts: list[str]) -> list[str]:
+        return self._decode([self.encode(text) for text in texts])
+
+    def generate(self, texts: Iterable[str]) -> Iterator[str]:
+        return generate_bucketed(texts, self.encode, self._decode, self.batch_size)
@@ -0,0 +1,38 @@
+"""Hugging Face checkpoints on vLLM, which schedules each batch on the GPU itself."""
+
+from __future__ import annotations
+
+import argparse
+
+from vllm import LLM, SamplingParams
+
+from backends import SYSTEM_PROMPT, Backend, reject_options
+
+
+class VLLMBackend(Backend):
+    """Hands ``--parallel`` lines at a time to ``LLM.chat``; raise it well above
+    the GPU's concurrent sequence count so the scheduler always has work."""
+
+    def __init__(self, args: argparse.Namespace, n_threads: int | None = None) -> None:
+        super().__init__()
+        reject_options(args, "grammar", "kv_size", "budget_ratio", "fit_budget", "compile", "precision")
+        self.batch_size = args.parallel
+        # Prompt-lookup speculation, the counterpart of the llama.cpp --draft.
+        speculative_config = (
+            {"method": "ngram", "num_speculative_tokens": args.draft, "prompt_lookup_max": 3} if args.draft else None
+        )
+        self.llm = LLM(
+            model=args.model,
+            disable_sliding_window=True,
+            max_model_len=args.n_ctx,
+            speculative_config=speculative_config,
+        )
+        self.sampling_params = SamplingParams(temperature=args.temperature, max_tokens=args.max_tokens)
+
+    def generate_batch(self, texts: list[str]) -> list[str]:
+        conversations = [
+            [{"role": "system", "content": SYSTEM_PROMPT}, {"role": "user", "content": text}] for text in texts
+        ]
+        results = self.llm.chat(conversations, self.sampling_params, use_tqdm=False)
+        self.stats["generated_tokens"] += sum(len(result.outputs[0].token_ids) for result in results)
+        return [result.outputs[0].text for result in results]
@@ -0,0 +1,238 @@
+# /// script
+# requires-python = ">=3.11"
+# dependencies = [
+#     "onnx",
+#     "onnxruntime",
+#     "torch",
+#     "transformers",
+# ]
+# ///
+
+"""Export a T5/ByT5 seq2seq checkpoint to ONNX for the onnx backend (backends/ort.py).
+
+Writes two graphs next to the tokenizer and config:
+
+- ``encoder.onnx``: input_ids, attention_mask -> the cross-attention keys
+  and values of every decoder layer, so the encoder states are projected
+  once per batch rather than once per decoding step.
+- ``decoder_with_past.onnx``: one decoding step. Takes the last token, the
+  encoder mask, the self-attention cache so far (empty on the first step)
+  and the cross-attention keys/values; returns next-token logits and the
+  grown cache.
+
+--int8 quantizes the weights of both graphs dynamically (onnxruntime).
+--compare runs the seq2seq (PyTorch) and onnx backends over the same JSONL
+and prints load time, peak memory, tokens/s and whether the outputs match.
+
+    python export_onnx.py output/losie/byt5 output/losie/byt5-onnx --int8 --compare data/test.jsonl
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+
+import torch
+from torch import nn
+from transformers import AutoModelForSeq2SeqLM, AutoTokenizer
+
+OPSET = 17
+
+
+class EncoderExport(nn.Module):
+    def __init__(self, model) -> None:
+        super().__init__()
+        self.encoder = model.get_encoder()
+        self.cross = nn.ModuleList(block.layer[1].EncDecAttention for block in model.get_decoder().block)
+        self.n_heads, self.d_kv = model.config.num_heads, model.config.d_kv
+
+    def forward(self, input_ids: torch.Tensor, attention_mask: torch.Tensor) -> tuple[torch.Tensor, ...]:
+        states = self.encoder(input_ids=input_ids, attention_mask=attention_mask).last_hidden_state
+        shape = (states.shape[0], states.shape[1], self.n_heads, self.d_kv)
+        outputs = []
+        for attn in self.cross:
+            outputs.append(attn.k(states).view(shape).transpose(1, 2))
+            outputs.append(attn.v(states).view(shape).transpose(1, 2))
+        return tuple(outputs)
+
+
+class DecoderStepExport(nn.Module):
+    """The T5 decoder for a single new token, written out so it traces to a plain graph."""
+
+    def __init__(self, model) -> None:
+        super().__init__()
+        decoder = model.get_decoder()
+        self.embed = decoder.embed_tokens
+        self.blocks = decoder.block
+        self.final_norm = decoder.final_layer_norm
+        self.lm_head = model.lm_head
+        self.scale = model.config.d_model**-0.5 if model.config.scale_decoder_outputs else 1.0
+        self.n_heads, self.d_kv = model.config.num_heads, model.config.d_kv
+
+    def _attend(self, attn, hidden, keys, values, bias):
+        query = attn.q(hidden).view(hidden.shape[0], 1, self.n_heads, self.d_kv).transpose(1, 2)
+        scores = torch.matmul(query, keys.transpose(2, 3)) + bias  # T5 does not scale the scores
+        weights = torch.softmax(scores.float(), dim=-1).type_as(scores)
+        out = torch.matmul(weights, values).transpose(1, 2).reshape(hidden.shape[0], 1, -1)
+        return attn.o(out)
+
+    def forward(self, input_ids, encoder_attention_mask, *cache):
+        n = len(self.blocks)
+        past, cross = cache[: 2 * n], cache[2 * n :]
+        hidden = self.embed(input_ids)
+        first = self.blocks[0].layer[0].SelfAttention
+        self_bias = first.compute_bias(1, past[0].shape[2] + 1, past_seen_tokens=past[0].shape[2])
+        cross_bias = (1.0 - encoder_attention_mask[:, None, None, :].to(hidden.dtype)) * torch.finfo(hidden.dtype).min
+        present = []
+        for i, block in enumerate(self.blocks):
+            self_layer, cross_layer, ff = block.layer
+            attn = self_layer.SelfAttention
+            normed = self_layer.layer_norm(hidden)
+            shape = (hidden.shape[0], 1, self.n_heads, self.d_kv)
+            keys = torch.cat([past[2 * i], attn.k(normed).view(shape).transpose(1, 2)], dim=2)
+            values = torch.cat([past[2 * i + 1], attn.v(normed).view(shape).transpose(1, 2)], dim=2)
+            present += [keys, values]
+            hidden = hidden + self._attend(attn, normed, keys, values, self_bias)
+            normed = cross_layer.layer_norm(hidden)
+            hidden = hidden + self._attend(cross_layer.EncDecAttention, normed, cross[2 * i], cross[2 * i + 1], cross_bias)
+            hidden = ff(hidden)
+        logits = self.lm_head(self.final_norm(hidden) * self.scale)[:, 0]
+        return (logits, *present)
+
+
+def export(model_path: str, output_dir: str) -> None:
+    model = AutoModelForSeq2SeqLM.from_pretrained(model_path, dtype=torch.float32, attn_implementation="eager")
+    model.eval()
+    config = model.config
+    n_layers, n_heads, d_kv = config.num_decoder_layers, config.num_heads, config.d_kv
+    os.makedirs(output_dir, exist_ok=True)
+
+    # Example shapes only; every batch, source and cache axis is exported as dynamic.
+    batch, source, past = 2, 7, 3
+    input_ids = torch.full((batch, source), config.eos_token_id)
+    attention_mask = torch.ones(batch, source, dtype=torch.long)
+    cross_names = [f"cross_{kind}_{i}" for i in range(n_layers) for kind in ("key", "value")]
+    with torch.no_grad():
+        torch.onnx.export(
+            EncoderExport(model),
+            (input_ids, attention_mask),
+            os.path.join(output_dir, "encoder.onnx"),
+            dynamo=False,
+            input_names=["input_ids", "attention_mask"],
+            output_names=cross_names,
+            dynamic_axes={
+                "input_ids": {0: "batch", 1: "source"},
+                "attention_mask": {0: "batch", 1: "source"},
+                **{name: {0: "batch", 2: "source"} for name in cross_names},
+            },
+            opset_version=OPSET,
+        )
+
+        past_names = [f"past_{kind}_{i}" for i in range(n_layers) for kind in ("key", "value")]
+        present_names = [name.replace("past", "present") for name in past_names]
+        past_kv = [torch.randn(batch, n_heads, past, d_kv) for _ in past_names]
+        cross_kv = [torch.randn(batch, n_heads, source, d_kv) for _ in cross_names]
+        torch.onnx.export(
+            DecoderStepExport(model),
+            (input_ids[:, :1], attention_mask, *past_kv, *cross_kv),
+            os.path.join(output_dir, "decoder_with_past.onnx"),
+            dynamo=False,
+            input_names=["input_ids", "encoder_attention_mask", *past_names, *cross_names],
+            output_names=["logits", *present_names],
+            dynamic_axes={
+                "input_ids": {0: "batch"},
+                "encoder_attention_mask": {0: "batch", 1: "source"},
+                "logits": {0: "batch"},
+                **{name: {0: "batch", 2: "past"} for name in past_names},
+                **{name: {0: "batch", 2: "past_plus_one"} for name in present_names},
+                **{name: {0: "batch", 2: "source"} for name in cross_names},
+            },
+            opset_version=OPSET,
+        )
+    config.save_pretrained(output_dir)
+    AutoTokenizer.from_pretrained(model_path).save_pretrained(output_dir)
+
+
+def quantize(output_dir: str) -> None:
+    from onnxruntime.quantization import QuantType, quantize_dynamic
+    from onnxruntime.quantization.shape_inference import quant_pre_process
+
+    for name in ("encoder.onnx", "decoder_with_past.onnx"):
+        path = os.path.join(output_dir, name)
+        # Shape inference first, so every MatMul with a weight operand gets quantized.
+        quant_pre_process(path, path + ".prep", auto_merge=True)
+        quantize_dynamic(path + ".prep", path, weight_type=QuantType.QInt8)
+        os.remove(path + ".prep")
+
+
+def compare(model_path: str, onnx_dir: str, input_path: str, max_tokens: int, parallel: int, int8: bool) -> None:
+    """Run both backends as separate processes, so peak RSS is per backend.
+
+    An int8 export is compared with the PyTorch model at --precision int8.
+    """
+    inference = os.path.join(os.path.dirname(os.path.abspath(__file__)), "inference.py")
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        for backend, path in (("seq2seq", model_path), ("onnx", onnx_dir)):
+            output, report = os.path.join(tmp, f"{backend}.jsonl"), os.path.join(tmp, f"{backend}.json")
+            subprocess.run(
+                [
+                    sys.executable, inference, "--backend", backend, "--model", path,
+                    "--max-tokens", str(max_tokens), "--parallel", str(parallel),
+                    "--input", input_path, "--output", output, "--report", report,
+                    *(["--precision", "int8"] if int8 and backend == "seq2seq" else []),
+                ],
+                check=True,
+                stdout=subprocess.DEVNULL,
+            )
+            with open(report) as f:
+                results[backend] = json.load(f)
+            with open(output) as f:
+                results[backend]["outputs"] = [json.loads(line)["predicted"] for line in f]
+
+    print(f"{'backend':<10}{'load s':>10}{'peak RSS MiB':>14}{'tokens/s':>12}")
+    for backend, report in results.items():
+        stats = report["stats"]
+        tokens_per_second = stats["generated_tokens"] / max(stats["generate_seconds"], 1e-9)
+        print(f"{backend:<10}{report['load_seconds']:>10.2f}{report['peak_rss_mb']:>14.1f}{tokens_per_second:>12.1f}")
+    pairs = list(zip(results["seq2seq"]["outputs"], results["onnx"]["outputs"]))
+    print(f"Identical outputs: {sum(a == b for a, b in pairs)} of {len(pairs)} lines")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Export a T5/ByT5 seq2seq checkpoint to ONNX.")
+    parser.add_argument("model", help="Hugging Face seq2seq checkpoint directory")
+    parser.add_argument("output", help="Directory to write the ONNX graphs, config and tokenizer to")
+    parser.add_argument("--int8", action="store_true", help="Quantize the weights to int8 (dynamic quantization).")
+    parser.add_argument(
+        "--compare",
+        metavar="JSONL",
+        help="Afterwards, benchmark the onnx backend against the seq2seq backend on this input file.",
+    )
+    parser.add_argument(
+        "--max-tokens",
+        type=int,
+        default=1024,
+        help="Max tokens to generate in --compare runs (default: 1024).",
+    )
+    parser.add_argument(
+        "--parallel",
+        "-p",
+        type=int,
+        default=8,
+        help="Lines decoded together in --compare runs (default: 8).",
+    )
+    args = parser.parse_args()
+
+    export(args.model, args.output)
+    if args.int8:
+        quantize(args.output)
+    print(f"Exported {args.model} to {args.output}")
+    if args.compare:
+        compare(args.model, args.output, args.compare, args.max_tokens, args.parallel, args.int8)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,485 @@
+"""Multi-sequence llama.cpp decoding engine behind backends/llama_cpp.py."""
+
+from __future__ import annotations
+
+import math
+import multiprocessing
+import time
+from array import array
+from bisect import bisect_left
+from collections import Counter, OrderedDict, defaultdict, deque
+from collections.abc import Iterable, Iterator
+from dataclasses import dataclass, field
+from functools import partial
+
+import llama_cpp
+import numpy as np
+from llama_cpp._internals import LlamaBatch, LlamaContext, LlamaModel, LlamaSampler
+from llama_cpp._logger import set_verbose
+from llama_cpp.llama_chat_format import Jinja2ChatFormatter
+from llama_cpp.llama_grammar import LlamaGrammar
+
+BUDGET_SLACK = 16  # tokens added to every predicted output budget
+NGRAM_MAX = 3  # longest output suffix looked up in the prompt when drafting
+PRETOKENIZED_MAX = 4096  # prompts tokenized ahead of admission kept at most
+
+@dataclass
+class _Slot:
+    index: int
+    text: str
+    seq_id: int
+    sampler: LlamaSampler
+    feed: list[int]
+    n_prompt: int
+    max_tokens: int
+    reserved: int
+    queued_at: float
+    admitted_at: float
+    first_token_at: float = 0.0
+    n_past: int = 0
+    logits_at: int = -1
+    generated: list[int] = field(default_factory=list)
+    finished: bool = False
+    truncated: bool = False
+    source: list[int] = field(default_factory=list)
+    lookup: dict[tuple[int, ...], list[int]] = field(default_factory=dict)
+    cursor: int = 0
+    draft: list[int] = field(default_factory=list)
+    logprobs: list[float] | None = None
+
+
+def _ngram_index(tokens: list[int]) -> dict[tuple[int, ...], list[int]]:
+    """Map every n-gram (n <= NGRAM_MAX) to the ascending positions right after it."""
+    index = defaultdict(list)
+    for n in range(1, NGRAM_MAX + 1):
+        for end in range(n, len(tokens)):
+            index[tuple(tokens[end - n : end])].append(end)
+    return dict(index)
+
+
+class BatchEngine:
+    """Decode several chat prompts together in one llama.cpp context.
+
+    Every prompt is assigned a sequence slot. Each step packs one pending
+    token per decoding slot (plus prompt chunks for newly admitted slots)
+    into a single ``llama_decode`` call, so all slots share one forward pass.
+    Finished slots are refilled immediately to keep the batch full.
+
+    The chat-template prefix (system prompt plus the user-turn header) is the
+    same for every line, so it is evaluated once into a reserved sequence and
+    shared into each new slot with ``llama_memory_seq_cp``; only the log line
+    itself and the generation are computed per request.
+
+    Slots draw KV cells from one pool of ``kv_size`` cells. Each admitted
+    line reserves its prompt plus its output budget, capped at ``n_ctx``.
+    By default the budget is ``max_tokens``; with ``budget_ratio`` set it is
+    predicted from the input length, so short lines reserve little and more
+    of them run together. A line that hits a predicted budget is extended in
+    place when the pool has room, and otherwise retried with double the
+    budget, never exceeding ``max_tokens``.
+
+    With ``n_draft`` > 0, decoding slots speculate by prompt lookup: the last
+    generated n-gram is matched against the prompt and up to ``n_draft``
+    tokens that follow the match are appended to the slot's next batch
+    entry. Every drafted position gets logits; drafts are accepted while they
+    equal what the sampler picks, and the KV cells of the rest are dropped.
+    Extraction targets copy most values verbatim, so several tokens are
+    often accepted per forward pass. Outputs match non-speculative decoding.
+
+    ``generate_with_logprobs`` also returns the log-probability of every
+    sampled token (end of generation included) under the model's raw
+    distribution, before grammar masking and temperature.
+    """
+
+    def __init__(
+        self,
+        model_path: str,
+        system_prompt: str,
+        *,
+        n_parallel: int = 1,
+        n_ctx: int = 2048,
+        kv_size: int | None = None,
+        n_batch: int = 512,
+        n_threads: int | None = None,
+        max_tokens: int = 1024,
+        temperature: float = 0.1,
+        grammar: str | None = None,
+        budget_ratio: float | None = None,
+        n_draft: int = 0,
+    ) -> None:
+        set_verbose(False)
+        llama_cpp.llama_backend_init()
+
+        model_params = llama_cpp.llama_model_default_params()
+        model_params.n_gpu_layers = 0x7FFFFFFF  # offload every layer if a GPU exists
+        model_params.use_mmap = True
+        self.model = LlamaModel(path_model=model_path, params=model_params, verbose=False)
+
+        self.system_prompt = system_prompt
+        self.n_parallel = n_parallel
+        self.n_ctx = n_ctx
+        self.max_tokens = max_tokens
+        self.temperature = temperature
+        self.grammar = LlamaGrammar.from_string(grammar) if grammar else None
+        self.budget_ratio = budget_ratio
+        self.n_draft = n_draft
+        self.formatter = self._chat_formatter()
+        self.n_vocab = self.model.n_vocab()
+        self.stats = Counter()
+        # Per-line milliseconds (and decode tokens/s) of every completed generation.
+        self.timings: defaultdict[str, array] = defaultdict(partial(array, "d"))
+        self.prefix_seq = n_parallel
+        self.prefix_tokens = self._prefix_tokens()
+        self.prompt_overhead = len(self.tokenize_prompt(""))
+        if self.prompt_overhead + max_tokens >= n_ctx:
+            # No line could get its full budget, and _admit would cut every output short.
+            raise ValueError(
+                f"--max-tokens {max_tokens} plus the {self.prompt_overhead}-token prompt template "
+                f"leaves no room for input in --n-ctx {n_ctx}"
+            )
+        self._pretokenized: OrderedDict[str, list[int]] = OrderedDict()
+        # Cells the slots may reserve; the shared prefix is stored once on top.
+        self.kv_size = max(kv_size or n_ctx * n_parallel, n_ctx)
+        self.free_cells = self.kv_size
+
+        n_threads = n_threads or max(multiprocessing.cpu_count() // 2, 1)
+        n_batch = max(n_batch, n_parallel)
+        ctx_params = llama_cpp.llama_context_default_params()
+        ctx_params.n_ctx = self.kv_size + len(self.prefix_tokens)
+        ctx_params.n_batch = n_batch
+        ctx_params.n_ubatch = n_batch
+        ctx_params.n_seq_max = n_parallel + 1  # last sequence holds the shared prefix
+        ctx_params.kv_unified = True  # lets slots reference the prefix cells instead of copying
+        ctx_params.n_threads = n_threads
+        ctx_params.n_threads_batch = n_threads
+        self.ctx = LlamaContext(model=self.model, params=ctx_params, verbose=False)
+        self.batch = LlamaBatch(n_tokens=n_batch, embd=0, n_seq_max=1, verbose=False)
+        # llama.cpp clamps the batch to the context size when the KV pool is small.
+        self.n_batch = min(n_batch, llama_cpp.llama_n_batch(self.ctx.ctx))
+        self._prefill_prefix()
+
+    def _chat_formatter(self) -> Jinja2ChatFormatter:
+        metadata = self.model.metadata()
+        template = metadata.get("tokenizer.chat_template")
+        if template is None:
+            raise ValueError("GGUF model has no tokenizer.chat_template metadata")
+        eos_id, bos_id = self.model.token_eos(), self.model.token_bos()
+        return Jinja2ChatFormatter(
+            template=template,
+            eos_token=self.model.token_get_text(eos_id) if eos_id != -1 else "",
+            bos_token=self.model.token_get_text(bos_id) if bos_id != -1 else "",
+        )
+
+    def _new_sampler(self) -> LlamaSampler:
+        # Mirrors the create_chat_completion defaults the REPL used to rely on.
+        sampler = LlamaSampler()
+        if self.grammar is not None:
+            # Each slot gets its own grammar state; it masks tokens before sampling.
+            sampler.add_grammar(self.model, self.grammar)
+        if self.temperature <= 0:
+            sampler.add_greedy()
+        else:
+            sampler.add_top_k(40)
+            sampler.add_top_p(0.95)
+            sampler.add_min_p(0.05)
+            sampler.add_temp(self.temperature)
+            sampler.add_dist(llama_cpp.LLAMA_DEFAULT_SEED)
+        return sampler
+
+    def _render(self, user_input: str) -> str:
+        messages = [
+            {"role": "system", "content": self.system_prompt},
+            {"role": "user", "content": user_input},
+        ]
+        return self.formatter(messages=messages).prompt
+
+    def _tokenize(self, text: str) -> list[int]:
+        return self.model.tokenize(text.encode("utf-8"), add_bos=False, special=True)
+
+    def _prefix_tokens(self) -> list[int]:
+        # Everything the template renders before the user content is shared.
+        marker = "\x00"
+        prefix = self._render(marker).split(marker, 1)[0]
+        return self._tokenize(prefix) if prefix else []
+
+    def _shared_prefix_len(self, tokens: list[int]) -> int:
+        # Tokenizers may merge across the prefix boundary (e.g. SentencePiece's
+        # leading space), so only reuse the cache when the tokens really match.
+        n = len(self.prefix_tokens)
+        if n < len(tokens) and tokens[:n] == self.prefix_tokens:
+            return n
+        return 0
+
+    def _prefill_prefix(self) -> None:
+        batch = self.batch.batch
+        for start in range(0, len(self.prefix_tokens), self.n_batch):
+            chunk = self.prefix_tokens[start : start + self.n_batch]
+            batch.n_tokens = 0
+            for pos, token in enumerate(chunk, start):
+                self._add_token(token, pos, self.prefix_seq, logits=False)
+            self.ctx.decode(self.batch)
+
+    def _add_token(self, token: int, pos: int, seq_id: int, logits: bool) -> None:
+        batch = self.batch.batch
+        i = batch.n_tokens
+        batch.token[i] = token
+        batch.pos[i] = pos
+        batch.n_seq_id[i] = 1
+        batch.seq_id[i][0] = seq_id
+        batch.logits[i] = logits
+        batch.n_tokens += 1
+
+    def tokenize_prompt(self, user_input: str) -> list[int]:
+        return self._tokenize(self._render(user_input))
+
+    def pretokenize(self, text: str) -> None:
+        """Tokenize the prompt for ``text`` ahead of its admission.
+
+        Safe to call from a reader thread: tokenization only reads the
+        vocabulary and releases the GIL. Texts that never reach the engine
+        (served by a cache stage) age out after PRETOKENIZED_MAX newer ones.
+        """
+        self._pretokenized[text] = self.tokenize_prompt(text)
+        if len(self._pretokenized) > PRETOKENIZED_MAX:
+            self._pretokenized.popitem(last=False)
+
+    def count_tokens(self, text: str) -> int:
+        return len(self._tokenize(text))
+
+    def budget(self, text: str) -> int:
+        """Output tokens to reserve for ``text`` before any retry."""
+        if self.budget_ratio is None:
+            return self.max_tokens
+        predicted = math.ceil(self.budget_ratio * self.count_tokens(text)) + BUDGET_SLACK
+        return min(predicted, self.max_tokens)
+
+    def _reservation(self, n_prompt: int, max_tokens: int) -> int:
+        """KV cells for a prompt and its output budget; generation stops at ``n_ctx``."""
+        return min(n_prompt + max_tokens, self.n_ctx)
+
+    def fits(self, text: str) -> bool:
+        """Whether ``text`` is admitted with its whole output budget, not one cut at ``n_ctx``."""
+        budget = self.budget(text)
+        # No tokenizer yields more tokens than UTF-8 bytes, which skips tokenizing most lines.
+        if len(text.encode("utf-8")) + self.prompt_overhead + budget < self.n_ctx:
+            return True
+        n_prompt = len(self.tokenize_prompt(text))
+        return self._reservation(n_prompt, budget) == n_prompt + budget
+
+    def _admit(
+        self, free: list[int], index: int, text: str, max_tokens: int, queued_at: float, logprobs: bool = False
+    ) -> _Slot | None:
+        """Start a slot for ``text``, or return None if the KV pool is too full."""
+        tokens = self._pretokenized.pop(text, None) or self.tokenize_prompt(text)
+        if len(tokens) >= self.n_ctx:
+            raise ValueError(
+                f"Input {index} needs {len(tokens)} prompt tokens, "
+                f"exceeding the context window ({self.n_ctx})"
+            )
+        shared = self._shared_prefix_len(tokens)
+        reserved = self._reservation(len(tokens), max_tokens) - shared
+        if reserved > self.free_cells:
+            return None
+        self.free_cells -= reserved
+        seq_id = free.pop()
+        if shared:
+            self.ctx.kv_cache_seq_cp(self.prefix_seq, seq_id, -1, -1)
+        self.stats["prompt_tokens"] += len(tokens)
+        self.stats["cached_prompt_tokens"] += shared
+        slot = _Slot(
+            index,
+            text,
+            seq_id,
+            self._new_sampler(),
+            tokens[shared:],
+            n_prompt=len(tokens),
+            max_tokens=max_tokens,
+            reserved=reserved,
+            queued_at=queued_at,
+            admitted_at=time.perf_counter(),
+            n_past=shared,
+            logprobs=[] if logprobs else None,
+        )
+        if self.n_draft:
+            slot.source = tokens[shared:]
+            slot.lookup = _ngram_index(slot.source)
+        return slot
+
+    def _release(self, free: list[int], slot: _Slot) -> None:
+        self.ctx.kv_cache_seq_rm(slot.seq_id, -1, -1)
+        free.append(slot.seq_id)
+        self.free_cells += slot.reserved
+
+    def _extend(self, slot: _Slot) -> bool:
+        """Raise a truncated slot's budget in place if the pool has room."""
+        max_tokens = min(2 * slot.max_tokens, self.max_tokens)
+        extra = self._reservation(slot.n_prompt, max_tokens) - self._reservation(slot.n_prompt, slot.max_tokens)
+        if extra > self.free_cells:
+            return False
+        self.free_cells -= extra
+        slot.reserved += extra
+        slot.max_tokens = max_tokens
+        slot.finished = slot.truncated = False
+        return True
+
+    def generate(self, texts: Iterable[str]) -> Iterator[str]:
+        """Yield one completion per input text, in input order."""
+        return (output for output, _ in self._generate(texts, logprobs=False))
+
+    def generate_with_logprobs(self, texts: Iterable[str]) -> Iterator[tuple[str, list[float]]]:
+        """Yield (completion, per-token log-probabilities) per input text, in input order."""
+        return self._generate(texts, logprobs=True)
+
+    def _generate(self, texts: Iterable[str], logprobs: bool) -> Iterator[tuple[str, list[float] | None]]:
+        source = enumerate(texts)
+        free = list(reversed(range(self.n_parallel)))
+        retry: deque[tuple[int, str, int, float]] = deque()
+        active: list[_Slot] = []
+        done: dict[int, tuple[str, list[float] | None]] = {}
+        waiting: tuple[int, str, int, float] | None = None
+        next_index = 0
+        exhausted = False
+
+        try:
+            while True:
+                while free:
+                    if waiting is None and retry:
+                        waiting = retry.popleft()
+                    if waiting is None and not exhausted:
+                        item = next(source, None)
+                        if item is None:
+                            exhausted = True
+                        else:
+                            waiting = (*item, self.budget(item[1]), time.perf_counter())
+                    if waiting is None:
+                        break
+                    slot = self._admit(free, *waiting, logprobs=logprobs)
+                    if slot is None:
+                        break  # wait for running slots to hand back KV cells
+                    active.append(slot)
+                    waiting = None
+
+                if not active:
+                    break
+
+                self._step(active)
+
+                for slot in [s for s in active if s.finished]:
+                    if slot.truncated and self._extend(slot):
+                        self.stats["budget_extended"] += 1
+                        continue
+                    active.remove(slot)
+                    self._release(free, slot)
+                    if slot.truncated:
+                        self.stats["budget_retried"] += 1
+                        retry.append(
+                            (slot.index, slot.text, min(2 * slot.max_tokens, self.max_tokens), slot.queued_at)
+                        )
+                        continue
+                    self._record(slot)
+                    output = self.model.detokenize(slot.generated).decode("utf-8", errors="replace")
+                    done[slot.index] = (output, slot.logprobs)
+
+                while next_index in done:
+                    yield done.pop(next_index)
+                    next_index += 1
+        finally:
+            # Release slots left behind by an error or an abandoned generator.
+            for slot in active:
+                self._release(free, slot)
+
+    def _record(self, slot: _Slot) -> None:
+        now = time.perf_counter()
+        first = slot.first_token_at or now  # a generation that ends at once has no first token
+        self.stats["generated_tokens"] += len(slot.generated)
+        self.timings["prompt_eval_ms"].append((first - slot.admitted_at) * 1000)
+        self.timings["ttft_ms"].append((first - slot.queued_at) * 1000)
+        self.timings["latency_ms"].append((now - slot.queued_at) * 1000)
+        if len(slot.generated) > 1 and now > first:
+            self.timings["decode_tokens_per_second"].append((len(slot.generated) - 1) / (now - first))
+
+    def _logprob(self, i: int, token: int) -> float:
+        """Log-probability of ``token`` under the logits at batch position ``i``."""
+        logits = np.ctypeslib.as_array(llama_cpp.llama_get_logits_ith(self.ctx.ctx, i), shape=(self.n_vocab,))
+        top = logits.max()
+        return float(logits[token] - top - np.log(np.exp(logits - top).sum()))
+
+    def _draft(self, slot: _Slot) -> list[int]:
+        """Tokens following the longest prompt match of the generated suffix."""
+        limit = min(
+            self.n_draft,
+            slot.max_tokens - len(slot.generated) - 1,
+            self.n_ctx - slot.n_past - 1,
+        )
+        if limit <= 0:
+            return []
+        for n in range(min(NGRAM_MAX, len(slot.generated)), 0, -1):
+            positions = slot.lookup.get(tuple(slot.generated[-n:]))
+            if positions:
+                # Prefer the first match past the last copied span; values come in order.
+                i = bisect_left(positions, slot.cursor)
+                slot.cursor = positions[i] if i < len(positions) else positions[0]
+                return slot.source[slot.cursor : slot.cursor + limit]
+        return []
+
+    def _step(self, active: list[_Slot]) -> None:
+        batch = self.batch.batch
+        batch.n_tokens = 0
+        budget = self.n_batch
+
+        # Decoding slots feed a single token (plus drafts); serve them before prompt chunks.
+        for slot in sorted(active, key=lambda s: len(s.feed)):
+            slot.logits_at = -1
+            slot.draft = []
+            if budget == 0:
+                continue
+            chunk = slot.feed[:budget]
+            del slot.feed[: len(chunk)]
+            if not slot.feed and slot.generated and self.n_draft:
+                slot.draft = self._draft(slot)[: budget - len(chunk)]
+            for token in chunk:
+                self._add_token(token, slot.n_past, slot.seq_id, logits=False)
+                slot.n_past += 1
+            if not slot.feed:
+                batch.logits[batch.n_tokens - 1] = True
+                slot.logits_at = batch.n_tokens - 1
+                for token in slot.draft:
+                    self._add_token(token, slot.n_past, slot.seq_id, logits=True)
+                    slot.n_past += 1
+            budget -= len(chunk) + len(slot.draft)
+
+        self.ctx.decode(self.batch)
+        now = time.perf_counter()
+
+        for slot in active:
+            if slot.logits_at < 0:
+                continue
+            slot.first_token_at = slot.first_token_at or now
+            self.stats["draft_tokens"] += len(slot.draft)
+            accepted = 0
+            # Position i holds the logits after draft[:i]; the sample there is
+            # either the next draft token (accepted) or the correction.
+            for i in range(len(slot.draft) + 1):
+                token = slot.sampler.sample(self.ctx, slot.logits_at + i)
+                if slot.logprobs is not None:
+                    slot.logprobs.append(self._logprob(slot.logits_at + i, token))
+                if llama_cpp.llama_vocab_is_eog(self.model.vocab, token):
+                    slot.finished = True
+                    break
+                slot.generated.append(token)
+                slot.feed = [token]
+                if slot.n_past - len(slot.draft) + accepted >= self.n_ctx:
+                    slot.finished = True
+                elif len(slot.generated) >= slot.max_tokens:
+                    slot.finished = True
+                    # Only a predicted budget is worth retrying; max_tokens is final.
+                    slot.truncated = slot.max_tokens < self.max_tokens
+                if slot.finished or i == len(slot.draft) or token != slot.draft[i]:
+                    break
+                accepted += 1
+            self.stats["draft_accepted"] += accepted
+            slot.cursor += accepted
+            rejected = len(slot.draft) - accepted
+            if rejected:
+                slot.n_past -= rejected
+                self.ctx.kv_cache_seq_rm(slot.seq_id, slot.n_past, -1)
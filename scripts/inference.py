@@ -0,0 +1,797 @@
+# /// script
+# requires-python = ">=3.11"
+# dependencies = [
+#     "llama-cpp-python",
+#     "orjson",
+# ]
+# ///
+
+import argparse
+import json
+import multiprocessing
+import os
+import queue
+import sys
+import threading
+import time
+from array import array
+from collections import Counter, defaultdict, deque
+from collections.abc import Callable, Iterable, Iterator
+from functools import partial
+from typing import BinaryIO
+
+from backends import BACKENDS, SYSTEM_PROMPT, Backend, load_backend
+from inference_cache import ResultCache
+from key_aliases import KeyAliases
+from line_chunks import LineChunker
+from log_templates import TemplateMiner
+from pre_extract import PreExtractor
+from run_report import build_report, write_report
+from span_pointers import expand
+
+try:
+    import orjson
+except ImportError:  # the standard library encoder is slower but equivalent
+    orjson = None
+
+SHARD_SIZE = 256 * 1024  # bytes of input JSONL per worker task
+CHECKPOINT_INTERVAL = 30.0  # seconds between fsync'd progress checkpoints
+PIPELINE_DEPTH = 1024  # records buffered between the reader, engine and writer threads
+WRITE_BUFFER = 1024 * 1024
+PROGRESS_INTERVAL = 0.5  # seconds between progress updates
+
+Generate = Callable[[Iterable[str]], Iterator[str]]
+
+_worker_generate: Generate | None = None
+_worker_stages: list = []
+_worker_error: Exception | None = None
+
+
+def open_cache(args: argparse.Namespace) -> ResultCache | None:
+    if not args.cache:
+        return None
+    cache = ResultCache(args.cache, args.cache_size * 1024 * 1024)
+    cache.bind(
+        args.model or args.backend,
+        SYSTEM_PROMPT,
+        {
+            "backend": args.backend,
+            "precision": args.precision,
+            "max_tokens": args.max_tokens,
+            "temperature": args.temperature,
+            "templates": args.templates,
+            "pre_extract": args.pre_extract,
+            "grammar": args.grammar,
+            "n_ctx": args.n_ctx,
+            # Hashed like the primary model, so re-quantizing it in place invalidates.
+            "escalate_model": args.escalate_model and cache.model_digest(args.escalate_model),
+            "escalate_below": args.escalate_below,
+            "span_pointers": args.span_pointers,
+            "chunk_long_lines": args.chunk_long_lines,
+            "aliases": KeyAliases.load(args.aliases).aliases if args.aliases else None,
+        },
+    )
+    return cache
+
+
+def build_pipeline(args: argparse.Namespace, backend: Backend) -> tuple[Generate, list]:
+    """Wrap the backend in the enabled short-circuit stages.
+
+    Order, outermost first: exact-match result cache, template reuse,
+    regex pre-extraction, long-line chunking, span-pointer expansion,
+    key-alias restoration, model. Returns the composed generate function and
+    every stage (for stats).
+    """
+    generate = backend.generate
+    stages = [backend]
+    if args.aliases:
+        generate = partial(KeyAliases.load(args.aliases).generate, generate=generate)
+    if args.span_pointers:
+        # Offsets only hold for the exact line they were generated for, so
+        # expand them before template reuse copies outputs between lines.
+        generate = partial(expand, generate=generate)
+    if args.chunk_long_lines:
+        chunker = LineChunker(backend.fits)
+        generate = partial(chunker.generate, generate=generate)
+        stages.append(chunker)
+    if args.pre_extract:
+        extractor = PreExtractor()
+        generate = partial(extractor.generate, generate=generate)
+        stages.append(extractor)
+    if args.templates:
+        miner = TemplateMiner()
+        generate = partial(miner.generate, generate=generate)
+        stages.append(miner)
+    cache = open_cache(args)
+    if cache is not None:
+        generate = partial(cache.generate, generate=generate)
+        stages.append(cache)
+    return generate, stages
+
+
+def run_stats(stages: list) -> Counter:
+    return sum((stage.stats for stage in stages), Counter())
+
+
+def dumps_line(record: dict) -> bytes:
+    """Serialize ``record`` as one UTF-8 JSONL line."""
+    if orjson is not None:
+        try:
+            return orjson.dumps(record, option=orjson.OPT_APPEND_NEWLINE)
+        except TypeError:
+            pass  # e.g. integers wider than 64 bits, which json handles
+    return (json.dumps(record, ensure_ascii=False) + "\n").encode()
+
+
+def annotate(
+    generate: Generate,
+    records: Iterable[dict],
+    input_key: str,
+    output_key: str,
+) -> Iterator[bytes]:
+    """Yield one output JSONL line per input record, in input order."""
+    pending = deque()
+
+    def values():
+        for record in records:
+            pending.append(record)
+            yield record[input_key]
+
+    for result in generate(values()):
+        record = pending.popleft()
+        record[output_key] = result
+        yield dumps_line(record)
+
+
+def micro_batches(lines: Iterable[str], max_batch: int, max_wait: float) -> Iterator[list[str]]:
+    """Group lines into batches closed by size or by the age of their first line.
+
+    A background thread reads ``lines`` into a bounded queue, so a slow model
+    blocks the reader (and, through the pipe, the producer) instead of
+    buffering without limit.
+    """
+    q: queue.Queue[str | None] = queue.Queue(maxsize=2 * max_batch)
+
+    def reader():
+        for line in lines:
+            q.put(line)
+        q.put(None)
+
+    threading.Thread(target=reader, daemon=True).start()
+    while (item := q.get()) is not None:
+        batch = [item]
+        deadline = time.monotonic() + max_wait
+        while len(batch) < max_batch:
+            try:
+                item = q.get(timeout=max(deadline - time.monotonic(), 0))
+            except queue.Empty:
+                break
+            if item is None:
+                yield batch
+                return
+            batch.append(item)
+        yield batch
+
+
+def run_stream(args: argparse.Namespace, generate: Generate) -> int:
+    """Parse stdin log lines (raw text or JSONL records) and stream JSONL to stdout.
+
+    Returns the number of lines written.
+    """
+    written = 0
+    for batch in micro_batches(sys.stdin, args.max_batch, args.max_wait):
+        lines = [line.rstrip("\r\n") for line in batch if line.strip()]
+        if args.stream_format == "jsonl":
+            records = map(json.loads, lines)
+        else:
+            records = ({args.input_key: line} for line in lines)
+        for out_line in annotate(generate, records, args.input_key, args.output_key):
+            sys.stdout.buffer.write(out_line)
+            sys.stdout.flush()
+            written += 1
+    return written
+
+
+def shard_ranges(path: str, shard_size: int, start: int = 0) -> list[tuple[int, int]]:
+    """Split a file from ``start`` into (start, end) byte ranges that end on line boundaries."""
+    size = os.path.getsize(path)
+    bounds = [start]
+    with open(path, "rb") as f:
+        while bounds[-1] + shard_size < size:
+            f.seek(bounds[-1] + shard_size)
+            f.readline()
+            if f.tell() >= size:
+                break
+            bounds.append(f.tell())
+    bounds.append(size)
+    return list(zip(bounds, bounds[1:]))
+
+
+class Checkpointer:
+    """Periodically fsyncs the output and records how much input it covers.
+
+    The checkpoint (``<output>.ckpt``) is replaced atomically and stores the
+    input byte offset of the next unprocessed line, the output size at that
+    point, and the number of lines written.
+    """
+
+    def __init__(self, output_path: str, fout, input_offset: int, lines: int) -> None:
+        self.path = output_path + ".ckpt"
+        self.fout = fout
+        self.input_offset = input_offset
+        self.lines = lines
+        self.last_save = time.monotonic()
+
+    def advance(self, input_offset: int, n_lines: int = 1) -> None:
+        self.input_offset = input_offset
+        self.lines += n_lines
+        if time.monotonic() - self.last_save >= CHECKPOINT_INTERVAL:
+            self.save()
+
+    def save(self) -> None:
+        self.fout.flush()
+        os.fsync(self.fout.fileno())
+        state = {"input_offset": self.input_offset, "output_offset": self.fout.tell(), "lines": self.lines}
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(state, f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.path)
+        self.last_save = time.monotonic()
+
+    def finish(self) -> None:
+        """Make the completed output durable and drop the checkpoint."""
+        self.fout.flush()
+        os.fsync(self.fout.fileno())
+        if os.path.exists(self.path):
+            os.remove(self.path)
+
+
+def open_output(args: argparse.Namespace) -> tuple[BinaryIO, int, int]:
+    """Open ``--output`` for writing and return (file, input offset, lines done).
+
+    With ``--resume``, complete records beyond the last checkpoint are kept,
+    a torn trailing record is truncated away, and the input offset points
+    just past the last input line that has a complete output record.
+    """
+    checkpoint_path = args.output + ".ckpt"
+    if not args.resume or not os.path.exists(args.output):
+        if os.path.exists(checkpoint_path):
+            os.remove(checkpoint_path)
+        return open(args.output, "wb", buffering=WRITE_BUFFER), 0, 0
+
+    state = {"input_offset": 0, "output_offset": 0, "lines": 0}
+    if os.path.exists(checkpoint_path):
+        with open(checkpoint_path) as f:
+            state = json.load(f)
+
+    fout = open(args.output, "r+b", buffering=WRITE_BUFFER)
+    fout.seek(state["output_offset"])
+    good_end, extra = state["output_offset"], 0
+    for line in fout:
+        if not line.endswith(b"\n"):
+            break
+        try:
+            json.loads(line)
+        except ValueError:
+            break
+        good_end += len(line)
+        extra += 1
+    if good_end < os.path.getsize(args.output):
+        print(f"Repairing torn record at byte {good_end} of {args.output}")
+    fout.truncate(good_end)
+    fout.seek(good_end)
+
+    with open(args.input, "rb") as fin:
+        fin.seek(state["input_offset"])
+        for _ in range(extra):
+            if not fin.readline():
+                sys.exit(f"Error: {args.output} has more records than {args.input} has lines")
+        input_offset = fin.tell()
+    return fout, input_offset, state["lines"] + extra
+
+
+def run_batch(
+    args: argparse.Namespace, generate: Generate, prefetch: Callable[[str], None] | None = None
+) -> int:
+    """Annotate --input into --output; returns the number of lines processed in this run.
+
+    A reader thread parses records (and runs ``prefetch`` on their inputs)
+    ahead of the model, and a writer thread serializes results into large
+    buffered writes, so the calling thread only drives the model. Bounded
+    queues between the three keep memory flat when one stage falls behind.
+    """
+    fout, input_offset, done = open_output(args)
+    if done:
+        print(f"Resuming after {done} lines (input byte {input_offset})")
+    read_q: queue.Queue = queue.Queue(maxsize=PIPELINE_DEPTH)
+    write_q: queue.Queue = queue.Queue(maxsize=PIPELINE_DEPTH)
+    errors: list[BaseException] = []
+
+    def read(fin: BinaryIO) -> None:
+        offset = input_offset
+        try:
+            for line in fin:
+                offset += len(line)
+                record = json.loads(line)
+                if prefetch is not None:
+                    prefetch(record[args.input_key])
+                read_q.put((record, offset))
+        except BaseException as e:
+            read_q.put(e)
+        else:
+            read_q.put(None)
+
+    def write(checkpoint: Checkpointer) -> None:
+        last_progress = 0.0
+        try:
+            while (item := write_q.get()) is not None:
+                record, end = item
+                fout.write(dumps_line(record))
+                checkpoint.advance(end)
+                if time.monotonic() - last_progress >= PROGRESS_INTERVAL:
+                    print(f"\r  Processed {checkpoint.lines} lines", end="", flush=True)
+                    last_progress = time.monotonic()
+        except BaseException as e:
+            errors.append(e)
+            while write_q.get() is not None:
+                pass  # keep draining so the model thread never blocks on a dead writer
+
+    with open(args.input, "rb") as fin, fout:
+        fin.seek(input_offset)
+        checkpoint = Checkpointer(args.output, fout, input_offset, done)
+        threading.Thread(target=read, args=(fin,), daemon=True).start()
+        writer = threading.Thread(target=write, args=(checkpoint,))
+        writer.start()
+        pending = deque()
+
+        def values() -> Iterator[str]:
+            while (item := read_q.get()) is not None:
+                if isinstance(item, BaseException):
+                    raise item
+                pending.append(item)
+                yield item[0][args.input_key]
+
+        try:
+            for result in generate(values()):
+                record, end = pending.popleft()
+                record[args.output_key] = result
+                write_q.put((record, end))
+                if errors:
+                    break
+        finally:
+            write_q.put(None)
+            writer.join()
+        if errors:
+            raise errors[0]
+        print(f"\r  Processed {checkpoint.lines} lines", end="", flush=True)
+        checkpoint.finish()
+    return checkpoint.lines - done
+
+
+def _init_worker(args: argparse.Namespace, n_threads: int) -> None:
+    # An initializer that raises makes the pool respawn the worker forever, so
+    # a load failure is kept and raised by the first shard instead.
+    global _worker_generate, _worker_stages, _worker_error
+    try:
+        _worker_generate, _worker_stages = build_pipeline(args, load_backend(args, n_threads))
+    except Exception as e:
+        _worker_error = e
+
+
+def _run_shard(task: tuple[str, int, int, str, str]) -> tuple[list[bytes], Counter, dict]:
+    if _worker_error is not None:
+        raise _worker_error
+    path, start, end, input_key, output_key = task
+    with open(path, "rb") as f:
+        f.seek(start)
+        lines = f.read(end - start).splitlines()
+    before = run_stats(_worker_stages)
+    out_lines = list(annotate(_worker_generate, map(json.loads, lines), input_key, output_key))
+    backend = _worker_stages[0]
+    timings = dict(backend.timings)
+    backend.timings.clear()
+    return out_lines, run_stats(_worker_stages) - before, timings
+
+
+def print_summary(stats: Counter, file=sys.stdout) -> None:
+    prompt, cached = stats["prompt_tokens"], stats["cached_prompt_tokens"]
+    if prompt:
+        print(
+            f"Prefill tokens saved by the prompt-prefix cache: {cached} of {prompt} ({cached / prompt * 100:.1f}%)",
+            file=file,
+        )
+    lookups = stats["cache_hits"] + stats["cache_duplicates"] + stats["cache_misses"]
+    if lookups:
+        print(
+            f"Result cache: {stats['cache_hits']} hits, {stats['cache_duplicates']} duplicates, "
+            f"{stats['cache_misses']} misses ({(lookups - stats['cache_misses']) / lookups * 100:.1f}% served), "
+            f"{stats['cache_evictions']} evictions",
+            file=file,
+        )
+    if stats["template_new"]:
+        print(
+            f"Template reuse: {stats['template_new']} new templates, "
+            f"{stats['template_reused']} lines reused, {stats['template_fallback']} fell back to the model",
+            file=file,
+        )
+    if stats["pre_extract_lines"]:
+        lines, matched, skipped = stats["pre_extract_lines"], stats["pre_extract_matched"], stats["pre_extract_skipped"]
+        formats = ", ".join(
+            f"{name.removeprefix('format_')} {count}" for name, count in sorted(stats.items()) if name.startswith("format_")
+        )
+        print(
+            f"Pre-extractor: {matched} of {lines} lines matched a format ({matched / lines * 100:.1f}%), "
+            f"{skipped} answered without the model ({skipped / lines * 100:.1f}%)" + (f"; {formats}" if formats else ""),
+            file=file,
+        )
+    if stats["chunked_lines"]:
+        print(
+            f"Long lines: {stats['chunked_lines']} split into {stats['chunks']} chunks, "
+            f"{stats['chunk_values_joined']} values rejoined, {stats['chunk_conflicts']} conflicts",
+            file=file,
+        )
+    if stats["draft_tokens"]:
+        print(
+            f"Prompt-lookup drafts: {stats['draft_accepted']} of {stats['draft_tokens']} accepted "
+            f"({stats['draft_accepted'] / stats['draft_tokens'] * 100:.1f}%)",
+            file=file,
+        )
+    if stats["forward_passes"] and stats["generated_tokens"] > stats["forward_passes"]:
+        print(
+            f"Prompt-lookup drafts: {stats['generated_tokens'] - stats['forward_passes']} accepted "
+            f"({stats['generated_tokens'] / stats['forward_passes']:.2f} tokens per forward pass)",
+            file=file,
+        )
+    if stats["budget_extended"] or stats["budget_retried"]:
+        print(
+            f"Adaptive budget: {stats['budget_extended']} outputs extended in place, "
+            f"{stats['budget_retried']} retried with a larger budget",
+            file=file,
+        )
+    if stats["cascade_lines"]:
+        lines, escalated = stats["cascade_lines"], stats["cascade_escalated"]
+        small, large = stats["cascade_small_seconds"], stats["cascade_large_seconds"]
+        print(
+            f"Cascade: {escalated} of {lines} lines escalated ({escalated / lines * 100:.1f}%); "
+            f"small model {lines / max(small, 1e-9):.1f} lines/s, "
+            f"large model {escalated / max(large, 1e-9):.1f} lines/s, "
+            f"blended {lines / max(small + large, 1e-9):.1f} lines/s",
+            file=file,
+        )
+    if stats["warmup_seconds"]:
+        print(f"Warm-up and compilation: {stats['warmup_seconds']:.1f}s", file=file)
+    if stats["generate_seconds"]:
+        print(
+            f"Steady state: {stats['generated_tokens']} tokens in {stats['generate_seconds']:.1f}s "
+            f"({stats['generated_tokens'] / stats['generate_seconds']:.1f} tokens/s)",
+            file=file,
+        )
+
+
+def run_workers(args: argparse.Namespace) -> None:
+    """Fan byte-range shards out to worker processes, writing results in input order.
+
+    With llama.cpp each worker maps the GGUF file (use_mmap), so the weights
+    live once in the page cache. CPU cores are divided evenly between workers.
+    """
+    cpus = len(os.sched_getaffinity(0)) if hasattr(os, "sched_getaffinity") else os.cpu_count()
+    n_threads = max(cpus // args.workers, 1)
+    fout, input_offset, done = open_output(args)
+    if done:
+        print(f"Resuming after {done} lines (input byte {input_offset})")
+    tasks = [
+        (args.input, start, end, args.input_key, args.output_key)
+        for start, end in shard_ranges(args.input, SHARD_SIZE, input_offset)
+    ]
+    print(f"Starting {args.workers} workers ({n_threads} threads each) on {len(tasks)} shards ...")
+    mp = multiprocessing.get_context("spawn")
+    stats = Counter()
+    timings = defaultdict(partial(array, "d"))
+    start_time = time.perf_counter()
+    with (
+        mp.Pool(args.workers, initializer=_init_worker, initargs=(args, n_threads)) as pool,
+        fout,
+    ):
+        checkpoint = Checkpointer(args.output, fout, input_offset, done)
+        # imap hands back shards in submission order, buffering any that finish early.
+        results = pool.imap(_run_shard, tasks)
+        for (_, _, end, _, _), (out_lines, shard_stats, shard_timings) in zip(tasks, results):
+            fout.write(b"".join(out_lines))
+            checkpoint.advance(end, len(out_lines))
+            stats += shard_stats
+            for name, values in shard_timings.items():
+                timings[name].extend(values)
+            print(f"\r  Processed {checkpoint.lines} lines", end="", flush=True)
+        checkpoint.finish()
+    print(f"\nDone. Output written to {args.output}")
+    print_summary(stats)
+    if args.report:
+        # Model loading happens inside the workers, so it is part of wall time here.
+        report = build_report(checkpoint.lines - done, time.perf_counter() - start_time, stats, timings, vars(args))
+        write_report(args.report, report)
+        print(f"Run report written to {args.report}")
+
+
+def add_backend_arguments(parser: argparse.ArgumentParser) -> None:
+    """Backend, sampling and short-circuit options shared by every inference entry point."""
+    parser.add_argument(
+        "--backend",
+        "-b",
+        choices=list(BACKENDS),
+        default="llama.cpp",
+        help="Model runtime (default: llama.cpp). mock needs no model and is for tests.",
+    )
+    parser.add_argument(
+        "--model",
+        "-m",
+        help="GGUF file for llama.cpp (the small model for cascade), Hugging Face checkpoint directory "
+        "for the other backends.",
+    )
+    parser.add_argument(
+        "--max-tokens",
+        type=int,
+        default=1024,
+        help="Max tokens to generate (default: 1024).",
+    )
+    parser.add_argument(
+        "--n-ctx",
+        type=int,
+        default=2048,
+        help="Context window per log line, prompt plus output (default: 2048).",
+    )
+    parser.add_argument(
+        "--temperature",
+        type=float,
+        default=0.1,
+        help="Sampling temperature (default: 0.1).",
+    )
+    parser.add_argument(
+        "--draft",
+        type=int,
+        default=0,
+        metavar="N",
+        help="Speculate up to N tokens per step by copying from the prompt where the output "
+        "matches it (prompt-lookup decoding; default: 0, off).",
+    )
+    parser.add_argument(
+        "--parallel",
+        "-p",
+        type=int,
+        default=8,
+        help="Log lines decoded together (default: 8).",
+    )
+    parser.add_argument(
+        "--span-pointers",
+        action="store_true",
+        help="The model was trained on span-pointer targets (transform_to_span_pointer_format.py); "
+        "expand its start:end offsets back into values.",
+    )
+    parser.add_argument(
+        "--aliases",
+        help="Key alias table the model was trained with (key_aliases.py); outputs get the full keys back.",
+    )
+    parser.add_argument(
+        "--chunk-long-lines",
+        action="store_true",
+        help="Split lines too long for --n-ctx at whitespace or punctuation, parse the chunks "
+        "in parallel and merge their fields.",
+    )
+    parser.add_argument(
+        "--templates",
+        action="store_true",
+        help="Run the model once per log template and map its output onto lines sharing the template.",
+    )
+    parser.add_argument(
+        "--pre-extract",
+        action="store_true",
+        help="Read timestamp, level, process/thread ids and logger from syslog, journald, log4j, nginx "
+        "and ISO-8601 headers by regex and send only the rest of the line to the model.",
+    )
+    parser.add_argument("--cache", help="SQLite file caching outputs by model, prompt, parameters and input.")
+    parser.add_argument(
+        "--cache-size",
+        type=int,
+        default=1024,
+        help="Maximum size of cached outputs in MiB before LRU eviction (default: 1024).",
+    )
+
+    llama = parser.add_argument_group("llama.cpp backend")
+    budget = llama.add_mutually_exclusive_group()
+    budget.add_argument(
+        "--budget-ratio",
+        type=float,
+        help="Predict each line's output budget as this many tokens per input token "
+        "(plus a small slack), capped at --max-tokens; truncated outputs are retried with more.",
+    )
+    budget.add_argument(
+        "--fit-budget",
+        metavar="TRAIN_JSONL",
+        help="Like --budget-ratio, with the ratio fitted on a text/target training split.",
+    )
+    llama.add_argument(
+        "--kv-size",
+        type=int,
+        help="KV cache cells shared by all parallel lines (default: --n-ctx x --parallel). "
+        "With an adaptive budget, lines reserve only what they need, so --parallel can exceed "
+        "--kv-size / --n-ctx.",
+    )
+    llama.add_argument(
+        "--grammar",
+        action="store_true",
+        help="Constrain decoding to `key value` lines ending with one `@ summary` line.",
+    )
+
+    cascade = parser.add_argument_group("cascade backend (llama.cpp options apply to both models)")
+    cascade.add_argument("--escalate-model", help="Larger GGUF file that re-parses low-confidence lines.")
+    cascade.add_argument(
+        "--escalate-below",
+        type=float,
+        default=0.8,
+        help="Escalate lines whose confidence (mean token probability times the share of values found "
+        "in the line, 0 for malformed outputs) is below this (default: 0.8).",
+    )
+
+    hf = parser.add_argument_group("transformers and seq2seq backends")
+    hf.add_argument(
+        "--compile",
+        action="store_true",
+        help="Use a static KV cache and a torch.compile'd decode step; compiles during a warm-up run "
+        "(transformers only).",
+    )
+    hf.add_argument(
+        "--precision",
+        choices=["fp32", "bf16", "int8"],
+        default="fp32",
+        help="bf16 weights and autocast (CPUs with native bf16 only), or dynamic int8 quantization "
+        "of the linear layers (default: fp32).",
+    )
+
+    mock = parser.add_argument_group("mock backend")
+    mock.add_argument(
+        "--mock-latency",
+        type=float,
+        default=0.0,
+        help="Seconds the mock backend sleeps per batch (default: 0).",
+    )
+
+
+def resolve_model(parser: argparse.ArgumentParser, args: argparse.Namespace) -> None:
+    """Require --model for real backends, make local paths absolute and check the output budget."""
+    if args.model is None and args.backend != "mock":
+        parser.error(f"--model is required by the {args.backend} backend")
+    # Decoder-only models hold prompt and output in one context window.
+    if args.backend in ("llama.cpp", "cascade", "transformers", "vllm") and args.max_tokens >= args.n_ctx:
+        parser.error(f"--max-tokens ({args.max_tokens}) must be below --n-ctx ({args.n_ctx})")
+    if args.model is not None and os.path.exists(args.model):
+        args.model = os.path.abspath(args.model)
+    if args.escalate_model is not None:
+        args.escalate_model = os.path.abspath(args.escalate_model)
+    gguf_files = {"llama.cpp": [args.model], "cascade": [args.model, args.escalate_model]}
+    for path in gguf_files.get(args.backend, []):
+        if path is not None and not os.path.isfile(path):
+            print(f"Error: model file not found: {path}", file=sys.stderr)
+            sys.exit(1)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description="Log parsing inference — batch JSONL (default), stream or interactive mode."
+    )
+    add_backend_arguments(parser)
+    parser.add_argument("--input", "-i", help="Input JSONL file (required for batch mode).")
+    parser.add_argument("--output", "-o", help="Output JSONL file (required for batch mode).")
+    parser.add_argument("--input-key", default="input", help="JSON key to read from each line (default: input).")
+    parser.add_argument("--output-key", default="predicted", help="JSON key for LLM response (default: predicted).")
+    parser.add_argument("--interactive", action="store_true", help="Run in interactive REPL mode.")
+    parser.add_argument(
+        "--stream",
+        action="store_true",
+        help="Read log lines from stdin and write JSONL results to stdout as they complete.",
+    )
+    parser.add_argument(
+        "--stream-format",
+        choices=("raw", "jsonl"),
+        default="raw",
+        help="Stdin format in stream mode: raw log lines or JSONL records (default: raw).",
+    )
+    parser.add_argument(
+        "--max-batch",
+        type=int,
+        default=32,
+        help="Most lines per micro-batch in stream mode (default: 32).",
+    )
+    parser.add_argument(
+        "--max-wait",
+        type=float,
+        default=0.05,
+        help="Seconds to wait for a micro-batch to fill in stream mode (default: 0.05).",
+    )
+    parser.add_argument(
+        "--resume",
+        action="store_true",
+        help="Continue an interrupted batch run, keeping complete records already in --output.",
+    )
+    parser.add_argument(
+        "--report",
+        help="Write a JSON report of per-line latency percentiles, tokens/s and peak RSS here.",
+    )
+    parser.add_argument(
+        "--workers",
+        "-w",
+        type=int,
+        default=1,
+        help="Worker processes for batch mode, each with its own model instance (default: 1).",
+    )
+    args = parser.parse_args()
+    resolve_model(parser, args)
+
+    if args.interactive and args.stream:
+        parser.error("--interactive and --stream are mutually exclusive")
+    if not args.interactive and not args.stream:
+        if not args.input or not args.output:
+            parser.error("--input and --output are required in batch mode (use --interactive for REPL)")
+
+    if not args.interactive and not args.stream and args.workers > 1:
+        run_workers(args)
+        return
+
+    # stdout carries the results in stream mode, so status goes to stderr.
+    status = sys.stderr if args.stream else sys.stdout
+    print(f"Loading model: {args.model}", file=status)
+    load_start = time.perf_counter()
+    if args.interactive:
+        args.parallel = 1
+    try:
+        backend = load_backend(args)
+    except ValueError as e:
+        parser.error(str(e))
+    generate, stages = build_pipeline(args, backend)
+    load_seconds = time.perf_counter() - load_start
+    print(f"Model loaded in {load_seconds:.1f}s.", file=status)
+    start_time = time.perf_counter()
+    lines = 0
+
+    if args.stream:
+        print("Reading log lines from stdin ...", file=status)
+        lines = run_stream(args, generate)
+        print_summary(run_stats(stages), file=status)
+    elif args.interactive:
+        print("Type a log line (Ctrl+D to quit).\n")
+
+        while True:
+            try:
+                user_input = input("> ")
+            except (EOFError, KeyboardInterrupt):
+                break
+
+            if not user_input.strip():
+                continue
+
+            print(next(iter(generate([user_input]))))
+            print()
+            lines += 1
+
+        print("\nDone.")
+        print_summary(run_stats(stages))
+    else:
+        budget_ratio = getattr(backend, "budget_ratio", None)
+        if budget_ratio is not None:
+            print(f"Output budget: {budget_ratio:.2f} tokens per input token, capped at {args.max_tokens}")
+        print(f"Processing {args.input} ...")
+        # Pre-tokenizing only pays off when no stage skips or splits lines before the backend.
+        prefetch = backend.pretokenize if len(stages) == 1 else None
+        lines = run_batch(args, generate, prefetch)
+        print(f"\nDone. Output written to {args.output}")
+        print_summary(run_stats(stages))
+
+    if args.report:
+        report = build_report(lines, time.perf_counter() - start_time, run_stats(stages), backend.timings, vars(args))
+        report["load_seconds"] = round(load_seconds, 3)
+        write_report(args.report, report)
+        print(f"Run report written to {args.report}", file=status)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,171 @@
+"""Persistent, content-addressed cache of model outputs for the inference scripts."""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import sqlite3
+import time
+from collections import Counter
+from collections.abc import Callable, Iterable, Iterator
+from itertools import islice
+
+CHUNK_SIZE = 4096  # input lines looked up and deduplicated together
+HASH_BLOCK = 1024 * 1024
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS results (
+    key TEXT PRIMARY KEY,
+    output TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    last_used INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS results_last_used ON results (last_used);
+CREATE TABLE IF NOT EXISTS models (
+    path TEXT PRIMARY KEY,
+    size INTEGER NOT NULL,
+    mtime_ns INTEGER NOT NULL,
+    digest TEXT NOT NULL
+);
+"""
+
+
+class ResultCache:
+    """SQLite store mapping (model, prompt, sampling params, input) to output.
+
+    Entries are evicted least-recently-used first once the stored outputs
+    exceed ``max_bytes``. Several processes may share one cache file.
+    """
+
+    def __init__(self, path: str, max_bytes: int) -> None:
+        # Callers may hand the cache to a worker thread; it is never used concurrently.
+        self.conn = sqlite3.connect(path, timeout=60, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.executescript(SCHEMA)
+        self.max_bytes = max_bytes
+        self.namespace = ""
+        self.stats = Counter()
+        self._size = self.conn.execute("SELECT COALESCE(SUM(size), 0) FROM results").fetchone()[0]
+
+    def close(self) -> None:
+        self.conn.close()
+
+    def model_digest(self, model_path: str) -> str:
+        """SHA-256 of the model, recomputed only when its size or mtime changes.
+
+        A checkpoint directory is hashed file by file, names included. A path
+        that does not exist (a hub model ID) stands for itself.
+        """
+        if not os.path.exists(model_path):
+            return model_path
+        if os.path.isdir(model_path):
+            files = sorted(
+                os.path.join(root, name) for root, _, names in os.walk(model_path) for name in names
+            )
+            stats = [os.stat(path) for path in files]
+            size, mtime_ns = sum(st.st_size for st in stats), max((st.st_mtime_ns for st in stats), default=0)
+        else:
+            files = [model_path]
+            st = os.stat(model_path)
+            size, mtime_ns = st.st_size, st.st_mtime_ns
+        row = self.conn.execute(
+            "SELECT digest FROM models WHERE path = ? AND size = ? AND mtime_ns = ?",
+            (model_path, size, mtime_ns),
+        ).fetchone()
+        if row:
+            return row[0]
+        h = hashlib.sha256()
+        for path in files:
+            if path != model_path:
+                h.update(os.path.relpath(path, model_path).encode() + b"\0")
+            with open(path, "rb") as f:
+                while block := f.read(HASH_BLOCK):
+                    h.update(block)
+        digest = h.hexdigest()
+        with self.conn:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO models VALUES (?, ?, ?, ?)",
+                (model_path, size, mtime_ns, digest),
+            )
+        return digest
+
+    def bind(self, model_path: str, system_prompt: str, params: dict) -> None:
+        """Scope all following lookups to one model, prompt and parameter set."""
+        self.namespace = json.dumps(
+            [self.model_digest(model_path), system_prompt, params], sort_keys=True
+        )
+
+    def key(self, text: str) -> str:
+        return hashlib.sha256(f"{self.namespace}\0{text}".encode()).hexdigest()
+
+    def get_many(self, keys: list[str]) -> dict[str, str]:
+        found: dict[str, str] = {}
+        for start in range(0, len(keys), 500):  # stay under SQLite's bound-parameter limit
+            part = keys[start : start + 500]
+            marks = ",".join("?" * len(part))
+            found.update(
+                self.conn.execute(
+                    f"SELECT key, output FROM results WHERE key IN ({marks})", part
+                ).fetchall()
+            )
+        if found:
+            now = time.time_ns()
+            with self.conn:
+                self.conn.executemany(
+                    "UPDATE results SET last_used = ? WHERE key = ?",
+                    [(now, k) for k in found],
+                )
+        return found
+
+    def put_many(self, items: dict[str, str]) -> None:
+        now = time.time_ns()
+        rows = [(k, v, len(v.encode()), now) for k, v in items.items()]
+        with self.conn:
+            self.conn.executemany("INSERT OR REPLACE INTO results VALUES (?, ?, ?, ?)", rows)
+        self._size += sum(row[2] for row in rows)
+        if self._size > self.max_bytes:
+            self._evict()
+
+    def _evict(self) -> None:
+        with self.conn:
+            # Other processes may have evicted or added entries in the meantime.
+            self._size = self.conn.execute("SELECT COALESCE(SUM(size), 0) FROM results").fetchone()[0]
+            victims: list[tuple[str]] = []
+            rows = self.conn.execute("SELECT key, size FROM results ORDER BY last_used")
+            for key, size in rows:
+                if self._size <= self.max_bytes:
+                    break
+                victims.append((key,))
+                self._size -= size
+            rows.close()
+            self.conn.executemany("DELETE FROM results WHERE key = ?", victims)
+        self.stats["cache_evictions"] += len(victims)
+
+    def generate(
+        self, texts: Iterable[str], generate: Callable[[Iterable[str]], Iterable[str]]
+    ) -> Iterator[str]:
+        """Yield outputs for ``texts`` in order, running ``generate`` only on unseen inputs.
+
+        Inputs are handled in chunks; identical inputs within a chunk are
+        generated once, and every generated output is stored before the chunk
+        is yielded so later chunks hit the cache.
+        """
+        texts = iter(texts)
+        while chunk := list(islice(texts, CHUNK_SIZE)):
+            keys = [self.key(text) for text in chunk]
+            found = self.get_many(list(set(keys)))
+            todo: dict[str, str] = {}
+            for key, text in zip(keys, chunk):
+                if key in found:
+                    self.stats["cache_hits"] += 1
+                elif key in todo:
+                    self.stats["cache_duplicates"] += 1
+                else:
+                    todo[key] = text
+            self.stats["cache_misses"] += len(todo)
+            if todo:
+                generated = dict(zip(todo, generate(todo.values())))
+                self.put_many(generated)
+                found.update(generated)
+            yield from (found[key] for key in keys)
@@ -0,0 +1,109 @@
+#!/usr/bin/env python3
+"""Short aliases for frequent target keys, built from a training split.
+
+Keys such as ``timestamp`` or ``process_id`` repeat in nearly every target
+and take several tokens each. An alias table maps the most frequent keys to
+single ASCII letters (one token in any BPE vocabulary). The chat-format
+transform applies it to training targets and the inference scripts reverse
+it on model outputs.
+
+Run as a script to build a table:
+
+    python key_aliases.py train.jsonl aliases.json
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import string
+from collections import Counter
+from collections.abc import Callable, Iterable, Iterator
+
+from targets import SUMMARY_KEY
+
+CODES = string.ascii_lowercase + string.ascii_uppercase
+
+
+def _keys(target: str) -> Iterator[str]:
+    for line in target.split("\n"):
+        key = line.split(" ", 1)[0]
+        if key and key != SUMMARY_KEY:
+            yield key
+
+
+class KeyAliases:
+    """Bidirectional mapping between target keys and their short codes."""
+
+    def __init__(self, aliases: dict[str, str]) -> None:
+        self.aliases = aliases
+        self.keys = {code: key for key, code in aliases.items()}
+
+    @classmethod
+    def build(cls, targets: Iterable[str], max_aliases: int = len(CODES), min_count: int = 1) -> KeyAliases:
+        """Alias the most frequent keys, skipping codes that are real keys themselves."""
+        counts = Counter(key for target in targets for key in _keys(target))
+        codes = [code for code in CODES if code not in counts]
+        frequent = [
+            key for key, n in counts.most_common() if n >= min_count and len(key) > 1
+        ]
+        return cls(dict(zip(frequent[:max_aliases], codes)))
+
+    @classmethod
+    def load(cls, path: str) -> KeyAliases:
+        with open(path) as f:
+            return cls(json.load(f))
+
+    def save(self, path: str) -> None:
+        with open(path, "w") as f:
+            json.dump(self.aliases, f, indent=2)
+            f.write("\n")
+
+    def _rewrite(self, target: str, table: dict[str, str]) -> str:
+        out_lines = []
+        for line in target.split("\n"):
+            key, sep, value = line.partition(" ")
+            out_lines.append(f"{table.get(key, key)}{sep}{value}")
+        return "\n".join(out_lines)
+
+    def encode(self, target: str) -> str:
+        return self._rewrite(target, self.aliases)
+
+    def decode(self, output: str) -> str:
+        return self._rewrite(output, self.keys)
+
+    def generate(
+        self, texts: Iterable[str], generate: Callable[[Iterable[str]], Iterable[str]]
+    ) -> Iterator[str]:
+        """Yield the outputs of ``generate`` with aliased keys restored."""
+        for output in generate(texts):
+            yield self.decode(output)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build a key alias table from a training split.")
+    parser.add_argument("input", help="Training JSONL file with a target field")
+    parser.add_argument("output", help="Alias table JSON file to write")
+    parser.add_argument(
+        "--max-aliases",
+        type=int,
+        default=len(CODES),
+        help=f"Most keys to alias (default: {len(CODES)}).",
+    )
+    parser.add_argument(
+        "--min-count",
+        type=int,
+        default=100,
+        help="Only alias keys seen at least this often (default: 100).",
+    )
+    args = parser.parse_args()
+
+    with open(args.input) as f:
+        targets = [json.loads(line)["target"] for line in f if line.strip()]
+    aliases = KeyAliases.build(targets, args.max_aliases, args.min_count)
+    aliases.save(args.output)
+    print(f"Aliased {len(aliases.aliases)} keys from {len(targets)} targets into {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,155 @@
+# /// script
+# requires-python = ">=3.11"
+# dependencies = [
+#     "torch",
+#     "transformers",
+# ]
+# ///
+
+"""Name the values of log lines with a key-generator model.
+
+A key-generator model is trained on one example per field
+(transform_to_key_generator_format.py): ``{text} <extra_id_99> {value}`` ->
+``key``. Given each line's candidate values, this builds every per-value
+prompt and reassembles the predicted keys into a ``key value`` target.
+
+A line's prompts always go to the backend as one padded batch, never one
+call per value; lines are packed together until a call holds --parallel
+prompts. Repeated values in a line share one prompt.
+
+    python key_generator.py -b seq2seq -m output/losie/keygen \
+        -i test.jsonl --input-key text --values-key target -o keys.jsonl
+
+Values come from ``--values-key``: a list of strings, or a ``key value``
+target string whose values are used (for scoring against a labelled split).
+"""
+
+import argparse
+import json
+import sys
+import time
+from collections import Counter, deque
+from collections.abc import Iterable, Iterator
+
+from backends import Backend, load_backend
+from inference import add_backend_arguments, dumps_line, resolve_model
+from run_report import build_report, write_report
+
+SEPARATOR = " <extra_id_99> "  # as written by transform_to_key_generator_format.py
+# The other backends wrap every prompt in the log parser's chat template.
+RAW_PROMPT_BACKENDS = ("seq2seq", "onnx", "mock")
+
+
+def candidate_values(field: list[str] | str) -> list[str]:
+    """Distinct values in first-seen order, from a list or from ``key value`` target lines."""
+    if isinstance(field, str):
+        pairs = (line.split(" ", maxsplit=1) for line in field.split("\n"))
+        field = [pair[1] for pair in pairs if len(pair) == 2 and pair[0] != "@"]
+    return list(dict.fromkeys(field))
+
+
+class KeyGenerator:
+    """Batches per-value prompts and turns the predicted keys back into targets."""
+
+    def __init__(self, backend: Backend, max_prompts: int) -> None:
+        self.backend = backend
+        self.max_prompts = max_prompts
+        self.stats = Counter()
+
+    def _run(self, pack: list[tuple[str, list[str]]]) -> list[str]:
+        prompts = [f"{text}{SEPARATOR}{value}" for text, values in pack for value in values]
+        keys = iter(self.backend.generate_batch(prompts) if prompts else [])
+        self.stats["model_calls"] += bool(prompts)
+        self.stats["prompts"] += len(prompts)
+        targets = []
+        for _, values in pack:
+            lines = []
+            for value in values:
+                key = next(keys).strip().split(maxsplit=1)
+                if key:
+                    lines.append(f"{key[0]} {value}")
+                else:
+                    self.stats["empty_keys"] += 1
+            targets.append("\n".join(lines))
+        return targets
+
+    def generate(self, items: Iterable[tuple[str, list[str]]]) -> Iterator[str]:
+        """Yield one ``key value`` target per (text, values) item, in order."""
+        pack: list[tuple[str, list[str]]] = []
+        size = 0
+        for text, values in items:
+            self.stats["lines"] += 1
+            self.stats["values"] += len(values)
+            if pack and size + len(values) > self.max_prompts:
+                yield from self._run(pack)
+                pack, size = [], 0
+            pack.append((text, values))
+            size += len(values)
+        if pack:
+            yield from self._run(pack)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Name the values of log lines with a key-generator model.")
+    add_backend_arguments(parser)
+    parser.add_argument("--input", "-i", required=True, help="Input JSONL file.")
+    parser.add_argument("--output", "-o", required=True, help="Output JSONL file.")
+    parser.add_argument("--input-key", default="input", help="JSON key of the log line (default: input).")
+    parser.add_argument(
+        "--values-key",
+        default="values",
+        help="JSON key of the candidate values: a list, or `key value` target lines (default: values).",
+    )
+    parser.add_argument("--output-key", default="predicted", help="JSON key for the `key value` target (default: predicted).")
+    parser.add_argument("--report", help="Write a JSON run report here.")
+    args = parser.parse_args()
+    if args.backend not in RAW_PROMPT_BACKENDS:
+        parser.error(
+            f"the {args.backend} backend formats prompts for the log parser; "
+            f"key-generator models need one of: {', '.join(RAW_PROMPT_BACKENDS)}"
+        )
+    resolve_model(parser, args)
+
+    print(f"Loading model: {args.model}")
+    load_start = time.perf_counter()
+    try:
+        backend = load_backend(args)
+    except ValueError as e:
+        parser.error(str(e))
+    load_seconds = time.perf_counter() - load_start
+    print(f"Model loaded in {load_seconds:.1f}s.")
+    generator = KeyGenerator(backend, args.parallel)
+
+    start_time = time.perf_counter()
+    pending: deque[dict] = deque()
+
+    def items(lines: Iterable[str]) -> Iterator[tuple[str, list[str]]]:
+        for line in lines:
+            record = json.loads(line)
+            pending.append(record)
+            yield record[args.input_key], candidate_values(record[args.values_key])
+
+    with open(args.input) as fin, open(args.output, "wb") as fout:
+        for target in generator.generate(items(fin)):
+            record = pending.popleft()
+            record[args.output_key] = target
+            fout.write(dumps_line(record))
+    stats = generator.stats
+    print(f"Done. Output written to {args.output}")
+    print(
+        f"Key generator: {stats['lines']} lines, {stats['values']} values, {stats['prompts']} prompts "
+        f"in {stats['model_calls']} batched calls ({stats['prompts'] / max(stats['model_calls'], 1):.1f} per call)"
+    )
+    if stats["empty_keys"]:
+        print(f"Empty keys (value dropped): {stats['empty_keys']}", file=sys.stderr)
+    if args.report:
+        report = build_report(
+            stats["lines"], time.perf_counter() - start_time, backend.stats + stats, backend.timings, vars(args)
+        )
+        report["load_seconds"] = round(load_seconds, 3)
+        write_report(args.report, report)
+        print(f"Run report written to {args.report}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,121 @@
+"""Split log lines that exceed the model context and merge the per-chunk outputs."""
+
+from __future__ import annotations
+
+import re
+from collections import Counter, deque
+from collections.abc import Callable, Iterable, Iterator
+
+from targets import SUMMARY_KEY, parse_target
+
+# Tried in order; the boundary nearest the middle of the text wins.
+WHITESPACE_RE = re.compile(r"\s")
+PUNCTUATION_RE = re.compile(r"[,;|&]")
+MIN_CHUNK = 16  # characters; shorter chunks carry too little context to parse
+
+
+def _split_point(text: str) -> tuple[int, int]:
+    """(end of left part, start of right part) for a split near the middle of ``text``."""
+    mid = len(text) // 2
+    for pattern, keep in ((WHITESPACE_RE, 0), (PUNCTUATION_RE, 1)):
+        positions = [m.start() for m in pattern.finditer(text, 1, len(text) - 1)]
+        if positions:
+            pos = min(positions, key=lambda p: abs(p - mid))
+            # Whitespace is dropped; punctuation stays at the end of the left part.
+            return (pos + 1, pos + 1) if keep else (pos, pos + 1)
+    return mid, mid
+
+
+class LineChunker:
+    """Run oversized lines through the model in chunks and merge the results.
+
+    ``fits(text)`` tells whether a text can be parsed in one generation.
+    Lines that fit pass through untouched. Others are split recursively at
+    the safe boundary closest to their middle (whitespace, then ``,;|&``,
+    then anywhere), and every chunk is sent to the model as its own input,
+    so chunks of one line decode in parallel slots.
+
+    Merge rules, applied in chunk order: the first value seen for a key is
+    kept; a later value equal to or contained in it is dropped; a later value
+    that contains it replaces it; a value that ends one chunk and another
+    that starts the next are rejoined across the boundary; any other
+    disagreement keeps the first value and counts as a conflict. The first
+    ``@`` summary is kept.
+
+    A span that does not fit and is shorter than twice ``min_chunk``
+    characters raises ValueError: the context is too small for the output
+    budget, and smaller fragments would only merge into noise.
+    """
+
+    def __init__(self, fits: Callable[[str], bool], min_chunk: int = MIN_CHUNK) -> None:
+        self.fits = fits
+        self.min_chunk = min_chunk
+        self.stats = Counter()
+
+    def split(self, line: str) -> list[tuple[int, int]]:
+        """(start, end) offsets of the chunks of ``line``, in order."""
+        spans = []
+        todo = [(0, len(line))]
+        while todo:
+            start, end = todo.pop()
+            if self.fits(line[start:end]):
+                spans.append((start, end))
+                continue
+            if end - start < 2 * self.min_chunk:
+                raise ValueError(
+                    f"cannot split a line into chunks of at least {self.min_chunk} characters that fit "
+                    "the context; raise --n-ctx or lower --max-tokens"
+                )
+            left_end, right_start = _split_point(line[start:end])
+            todo.append((start + right_start, end))
+            todo.append((start, start + left_end))
+        return spans
+
+    def merge(self, line: str, spans: list[tuple[int, int]], outputs: list[str]) -> str:
+        merged: dict[str, str] = {}
+        summary: str | None = None
+        for i, ((start, end), output) in enumerate(zip(spans, outputs)):
+            for key, value in parse_target(output):
+                if key == SUMMARY_KEY:
+                    summary = value if summary is None else summary
+                    continue
+                old = merged.get(key)
+                if old is None:
+                    merged[key] = value
+                elif value in old:
+                    continue
+                elif old in value:
+                    merged[key] = value
+                elif i and line.endswith(old, 0, spans[i - 1][1]) and line.startswith(value, start, end):
+                    merged[key] = line[spans[i - 1][1] - len(old) : start + len(value)]
+                    self.stats["chunk_values_joined"] += 1
+                else:
+                    self.stats["chunk_conflicts"] += 1
+        out_lines = [f"{key} {value}" if value else key for key, value in merged.items()]
+        if summary is not None:
+            out_lines.append(f"{SUMMARY_KEY} {summary}")
+        return "\n".join(out_lines)
+
+    def generate(
+        self, texts: Iterable[str], generate: Callable[[Iterable[str]], Iterable[str]]
+    ) -> Iterator[str]:
+        """Yield one (merged) output per text, in order."""
+        pending: deque[tuple[str, list[tuple[int, int]]]] = deque()
+
+        def source() -> Iterator[str]:
+            for text in texts:
+                spans = self.split(text)
+                if len(spans) > 1:
+                    self.stats["chunked_lines"] += 1
+                    self.stats["chunks"] += len(spans)
+                pending.append((text, spans))
+                yield from (text[start:end] for start, end in spans)
+
+        outputs = iter(generate(source()))
+        for first in outputs:
+            text, spans = pending.popleft()
+            if len(spans) == 1:
+                yield first
+                continue
+            rest = [next(outputs) for _ in spans[1:]]
+            yield self.merge(text, spans, [first, *rest])
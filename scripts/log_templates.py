@@ -0,0 +1,156 @@
+"""Drain-style log template mining used to reuse model outputs across similar lines."""
+
+from __future__ import annotations
+
+import re
+from bisect import bisect_right
+from collections import Counter, OrderedDict
+from collections.abc import Callable, Iterable, Iterator
+from itertools import islice
+
+from targets import SUMMARY_KEY
+
+CHUNK_SIZE = 4096  # input lines grouped by template together
+MAX_TEMPLATES = 100_000
+
+TOKEN_RE = re.compile(r"\w+|\s+|[^\w\s]")
+VARIABLE_RE = re.compile(r"\d")  # Drain's masking rule: tokens containing digits are variables
+WILDCARD = "<*>"
+
+
+def tokenize(line: str) -> list[str]:
+    """Split a line into word, whitespace and punctuation tokens that rejoin losslessly."""
+    return TOKEN_RE.findall(line)
+
+
+def template_of(tokens: list[str]) -> str:
+    return "".join(WILDCARD if VARIABLE_RE.search(tok) else tok for tok in tokens)
+
+
+def _offsets(tokens: list[str]) -> list[int]:
+    starts = [0]
+    for tok in tokens:
+        starts.append(starts[-1] + len(tok))
+    return starts
+
+
+def _token_at(starts: list[int], pos: int) -> int:
+    return bisect_right(starts, pos) - 1
+
+
+def _map_span(
+    start: int, end: int, ref: list[str], ref_starts: list[int], new_starts: list[int], new_line: str
+) -> str | None:
+    """Translate ``ref_line[start:end]`` onto the same token positions of the new line.
+
+    Returns None when a span boundary falls inside a variable token, where the
+    offset has no equivalent in the new line.
+    """
+    i = _token_at(ref_starts, start)
+    j = _token_at(ref_starts, end - 1)
+    if start == ref_starts[i] or not VARIABLE_RE.search(ref[i]):
+        new_start = new_starts[i] + (start - ref_starts[i])
+    else:
+        return None
+    if end == ref_starts[j + 1]:
+        new_end = new_starts[j + 1]
+    elif not VARIABLE_RE.search(ref[j]):
+        new_end = new_starts[j] + (end - ref_starts[j])
+    else:
+        return None
+    return new_line[new_start:new_end]
+
+
+def transfer(ref_line: str, ref_output: str, new_line: str) -> str | None:
+    """Rewrite ``ref_output`` (a ``key value`` target for ``ref_line``) for ``new_line``.
+
+    Both lines must share a template. Every value found verbatim in the
+    reference line is re-read from the same token positions of the new line.
+    Only the ``@`` summary may be other text, and it is kept only if it
+    contains none of the tokens that differ between the two lines; a
+    reformatted value (``5 ms`` for ``5ms``) cannot be re-read, so it fails
+    the transfer. Returns None when the output cannot be aligned, in which
+    case the caller should run the model.
+    """
+    ref, new = tokenize(ref_line), tokenize(new_line)
+    if len(ref) != len(new) or template_of(ref) != template_of(new):
+        return None
+    changed = {r for r, n in zip(ref, new) if r != n}
+    ref_starts, new_starts = _offsets(ref), _offsets(new)
+
+    out_lines = []
+    for line in ref_output.splitlines():
+        parts = line.split(" ", 1)
+        if len(parts) < 2 or not parts[1]:
+            out_lines.append(line)
+            continue
+        key, value = parts
+        candidates = set()
+        pos = ref_line.find(value)
+        while pos != -1:
+            candidates.add(_map_span(pos, pos + len(value), ref, ref_starts, new_starts, new_line))
+            pos = ref_line.find(value, pos + 1)
+        if candidates:
+            # Ambiguous when the same text maps to different spans of the new line.
+            if len(candidates) != 1 or None in candidates:
+                return None
+            value = candidates.pop()
+        elif changed and (key != SUMMARY_KEY or any(tok in value for tok in changed)):
+            return None
+        out_lines.append(f"{key} {value}")
+    return "\n".join(out_lines)
+
+
+class TemplateMiner:
+    """Group lines by masked template and run the model once per template.
+
+    The first line of each template is sent to the model; later lines get
+    their output by :func:`transfer` from that representative, falling back
+    to the model when alignment fails.
+    """
+
+    def __init__(self, max_templates: int = MAX_TEMPLATES) -> None:
+        self.max_templates = max_templates
+        self.templates: OrderedDict[str, tuple[str, str]] = OrderedDict()
+        self.stats = Counter()
+
+    def _remember(self, template: str, line: str, output: str) -> None:
+        self.templates[template] = (line, output)
+        self.templates.move_to_end(template)
+        if len(self.templates) > self.max_templates:
+            self.templates.popitem(last=False)
+
+    def generate(
+        self, texts: Iterable[str], generate: Callable[[Iterable[str]], Iterable[str]]
+    ) -> Iterator[str]:
+        """Yield outputs for ``texts`` in order, calling ``generate`` once per new template."""
+        texts = iter(texts)
+        while chunk := list(islice(texts, CHUNK_SIZE)):
+            templates = [template_of(tokenize(text)) for text in chunk]
+            outputs: list[str | None] = [None] * len(chunk)
+
+            new: dict[str, int] = {}
+            for i, template in enumerate(templates):
+                if template not in self.templates and template not in new:
+                    new[template] = i
+            for i, output in zip(new.values(), generate(chunk[i] for i in new.values())):
+                outputs[i] = output
+                self._remember(templates[i], chunk[i], output)
+            self.stats["template_new"] += len(new)
+
+            fallback = []
+            for i, (text, template) in enumerate(zip(chunk, templates)):
+                if outputs[i] is not None:
+                    continue
+                ref_line, ref_output = self.templates.get(template, (None, None))
+                if ref_line is not None:
+                    outputs[i] = transfer(ref_line, ref_output, text)
+                if outputs[i] is None:
+                    fallback.append(i)
+                else:
+                    self.stats["template_reused"] += 1
+            for i, output in zip(fallback, generate(chunk[i] for i in fallback)):
+                outputs[i] = output
+            self.stats["template_fallback"] += len(fallback)
+
+            yield from outputs
@@ -0,0 +1,130 @@
+#!/usr/bin/env python3
+"""Thin client for parse_daemon.py: parse log lines with a resident model.
+
+Only the standard library is imported, so a call costs a few milliseconds
+plus the parse itself. Lines come from the arguments or stdin, and one JSONL
+record per line is written to stdout as results arrive. With --start, a
+missing daemon is launched with the arguments after ``--``:
+
+    python parse_client.py 'Jan  1 00:00:00 host sshd[1]: Accepted'
+    tail -f app.log | python parse_client.py --start -- --model model.gguf
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from collections import deque
+from collections.abc import Iterable
+
+START_POLL = 0.1  # seconds between connection attempts while a daemon starts
+
+
+def default_socket_path() -> str:
+    if "LOSIE_SOCKET" in os.environ:
+        return os.environ["LOSIE_SOCKET"]
+    runtime_dir = os.environ.get("XDG_RUNTIME_DIR") or tempfile.gettempdir()
+    return os.path.join(runtime_dir, f"losie-{os.getuid()}.sock")
+
+
+def connect(path: str) -> socket.socket | None:
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        sock.connect(path)
+    except (FileNotFoundError, ConnectionRefusedError):
+        sock.close()
+        return None
+    return sock
+
+
+def start_daemon(path: str, daemon_args: list[str], timeout: float) -> socket.socket:
+    """Launch parse_daemon.py in its own session and wait until it accepts connections."""
+    log_path = path + ".log"
+    daemon = os.path.join(os.path.dirname(os.path.abspath(__file__)), "parse_daemon.py")
+    with open(log_path, "ab") as log:
+        process = subprocess.Popen(
+            [sys.executable, daemon, "--socket", path, *daemon_args],
+            stdin=subprocess.DEVNULL,
+            stdout=log,
+            stderr=subprocess.STDOUT,
+            start_new_session=True,
+        )
+    deadline = time.monotonic() + timeout
+    while (sock := connect(path)) is None:
+        if process.poll() is not None or time.monotonic() > deadline:
+            sys.exit(f"Error: parse daemon did not start; see {log_path}")
+        time.sleep(START_POLL)
+    return sock
+
+
+def send(sock: socket.socket, lines: Iterable[str], sent: deque) -> None:
+    with sock.makefile("wb") as f:
+        for line in lines:
+            line = line.rstrip("\r\n")
+            if not line.strip():
+                continue
+            sent.append(line)
+            f.write(line.encode() + b"\n")
+            f.flush()
+    sock.shutdown(socket.SHUT_WR)
+
+
+def main() -> None:
+    argv = sys.argv[1:]
+    daemon_args: list[str] = []
+    if "--" in argv:
+        split = argv.index("--")
+        argv, daemon_args = argv[:split], argv[split + 1 :]
+
+    parser = argparse.ArgumentParser(
+        description="Parse log lines with a resident parse_daemon.py model.",
+        epilog="Arguments after -- are passed to parse_daemon.py when --start launches it.",
+    )
+    parser.add_argument("lines", nargs="*", help="Log lines to parse (default: read stdin).")
+    parser.add_argument("--socket", default=default_socket_path(), help="Daemon socket (default: %(default)s).")
+    parser.add_argument("--start", action="store_true", help="Launch the daemon if none is listening.")
+    parser.add_argument(
+        "--start-timeout",
+        type=float,
+        default=300.0,
+        help="Seconds to wait for a launched daemon to load its model (default: 300).",
+    )
+    parser.add_argument("--input-key", default="input", help="JSON key for the log line (default: input).")
+    parser.add_argument("--output-key", default="predicted", help="JSON key for the result (default: predicted).")
+    args = parser.parse_args(argv)
+
+    sock = connect(args.socket)
+    if sock is None:
+        if not args.start:
+            sys.exit(f"Error: no parse daemon at {args.socket} (use --start -- <daemon arguments>)")
+        sock = start_daemon(args.socket, daemon_args, args.start_timeout)
+
+    # Send from a thread so results stream back while stdin is still open.
+    sent: deque[str] = deque()
+    threading.Thread(target=send, args=(sock, args.lines or sys.stdin, sent), daemon=True).start()
+    failed = False
+    with sock, sock.makefile("rb") as results:
+        for result in results:
+            reply = json.loads(result)
+            line = sent.popleft()
+            if "error" in reply:
+                print(f"Error: {reply['error']}: {line}", file=sys.stderr)
+                failed = True
+                continue
+            record = {args.input_key: line, args.output_key: reply["output"]}
+            sys.stdout.write(json.dumps(record, ensure_ascii=False) + "\n")
+            sys.stdout.flush()
+    if sent:
+        sys.exit("Error: the parse daemon closed the connection early")
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,148 @@
+# /// script
+# requires-python = ">=3.11"
+# dependencies = [
+#     "llama-cpp-python",
+#     "orjson",
+# ]
+# ///
+
+"""Resident parse daemon: keeps a model loaded behind a Unix domain socket.
+
+A client (parse_client.py) sends log lines, one per line, half-closes the
+connection and reads back one JSON object per line, ``{"output": ...}`` or
+``{"error": ...}``, in order as each micro-batch completes. Lines from
+concurrent clients share decode batches. After --idle-timeout seconds
+without a connection the daemon removes its socket and exits, which unloads
+the model; ``parse_client.py --start`` brings it back on the next call.
+"""
+
+import argparse
+import json
+import os
+import socketserver
+import sys
+import threading
+import time
+
+from backends import load_backend
+from inference import add_backend_arguments, build_pipeline, micro_batches, resolve_model
+from parse_client import connect, default_socket_path
+from serve import Batcher
+
+
+class Server(socketserver.ThreadingUnixStreamServer):
+    daemon_threads = True  # a client that never closes must not keep the daemon from exiting
+
+
+class Activity:
+    """Open connections and when the last one closed."""
+
+    def __init__(self) -> None:
+        self.lock = threading.Lock()
+        self.connections = 0
+        self.idle_since = time.monotonic()
+
+    def __enter__(self) -> None:
+        with self.lock:
+            self.connections += 1
+
+    def __exit__(self, *exc) -> None:
+        with self.lock:
+            self.connections -= 1
+            self.idle_since = time.monotonic()
+
+    def idle_for(self) -> float:
+        with self.lock:
+            return 0.0 if self.connections else time.monotonic() - self.idle_since
+
+
+def make_handler(
+    batcher: Batcher, activity: Activity, max_batch: int, max_wait: float
+) -> type[socketserver.StreamRequestHandler]:
+    class Handler(socketserver.StreamRequestHandler):
+        def handle(self) -> None:
+            with activity:
+                lines = (line.decode("utf-8", errors="replace").rstrip("\r\n") for line in self.rfile)
+                for batch in micro_batches(lines, max_batch, max_wait):
+                    start = time.perf_counter()
+                    request = batcher.submit(batch)
+                    request.done.wait()
+                    batcher.record(time.perf_counter() - start, len(batch))
+                    for output in request.outputs:
+                        reply = {"error": request.error} if output is None else {"output": output}
+                        self.wfile.write(json.dumps(reply, ensure_ascii=False).encode() + b"\n")
+                    self.wfile.flush()
+
+    return Handler
+
+
+def claim_socket(path: str) -> None:
+    """Remove a socket left behind by a dead daemon; exit if a live one owns it."""
+    if not os.path.exists(path):
+        return
+    sock = connect(path)
+    if sock is not None:
+        sock.close()
+        sys.exit(f"Error: a parse daemon is already listening on {path}")
+    os.remove(path)
+
+
+def watch_idle(server: socketserver.BaseServer, activity: Activity, timeout: float) -> None:
+    while activity.idle_for() < timeout:
+        time.sleep(min(timeout, 1.0))
+    print(f"Idle for {timeout:g}s; unloading the model and exiting.", flush=True)
+    server.shutdown()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Keep a log parsing model resident behind a Unix socket.")
+    add_backend_arguments(parser)
+    parser.add_argument("--socket", default=default_socket_path(), help="Socket path (default: %(default)s).")
+    parser.add_argument(
+        "--idle-timeout",
+        type=float,
+        default=900.0,
+        help="Exit, unloading the model, after this many seconds without a client; 0 never exits (default: 900).",
+    )
+    parser.add_argument(
+        "--max-batch",
+        type=int,
+        default=32,
+        help="Most lines coalesced into one decode batch (default: 32).",
+    )
+    parser.add_argument(
+        "--max-wait",
+        type=float,
+        default=0.01,
+        help="Seconds the first queued line waits for others to join its batch (default: 0.01).",
+    )
+    args = parser.parse_args()
+    resolve_model(parser, args)
+    claim_socket(args.socket)
+
+    print(f"Loading model: {args.model}", flush=True)
+    start = time.perf_counter()
+    try:
+        backend = load_backend(args)
+    except ValueError as e:
+        parser.error(str(e))
+    generate, stages = build_pipeline(args, backend)
+    batcher = Batcher(generate, stages, args.max_batch, args.max_wait)
+    activity = Activity()
+
+    with Server(args.socket, make_handler(batcher, activity, args.max_batch, args.max_wait)) as server:
+        os.chmod(args.socket, 0o600)
+        print(f"Model loaded in {time.perf_counter() - start:.1f}s. Listening on {args.socket}", flush=True)
+        if args.idle_timeout > 0:
+            threading.Thread(target=watch_idle, args=(server, activity, args.idle_timeout), daemon=True).start()
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            os.remove(args.socket)
+    print(json.dumps(batcher.metrics()), flush=True)
+
+
+if __name__ == "__main__":
+    main()
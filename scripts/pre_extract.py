@@ -0,0 +1,203 @@
+"""Regex fast path for the header fields of common log formats.
+
+The data-generation prompt names timestamp, level, process_id, thread_id and
+logger as the common keys, and in syslog, journald, log4j, nginx and plain
+ISO-8601 lines they sit in a fixed header a regex can read in microseconds.
+The pre-extractor takes them from the header and sends only the rest of the
+line (the message) to the model. Formats whose pattern spans the whole line
+(nginx access logs) skip the model altogether.
+"""
+
+from __future__ import annotations
+
+import re
+from collections import Counter
+from collections.abc import Callable, Iterable, Iterator
+from dataclasses import dataclass
+from itertools import islice
+
+from targets import SUMMARY_KEY, parse_target
+
+CHUNK_SIZE = 4096  # input lines extracted and sent to the model together
+ABSENT = {"", "-"}  # placeholders for missing values, as in nginx and RFC 5424
+HEADER_SUMMARY_KEYS = ("logger", "level")  # summary of a header with no message, first present wins
+
+MONTH = r"(?:Jan|Feb|Mar|Apr|May|Jun|Jul|Aug|Sep|Oct|Nov|Dec)"
+# Bare level words must be upper case; "[error]" in brackets may be any case.
+LEVEL = r"(?:TRACE|DEBUG|INFO|NOTICE|WARN(?:ING)?|ERROR|ERR|CRIT(?:ICAL)?|ALERT|EMERG|FATAL|SEVERE)"
+ANY_CASE_LEVEL = rf"(?i:{LEVEL})"
+ISO_DATE = r"\d{4}-\d{2}-\d{2}"
+ISO_TIME = r"\d{2}:\d{2}:\d{2}(?:[.,]\d{1,9})?(?:Z|[+-]\d{2}:?\d{2})?"
+LABEL = r"[A-Za-z0-9](?:[A-Za-z0-9-]*[A-Za-z0-9])?"
+HOST = rf"(?:\d{{1,3}}(?:\.\d{{1,3}}){{3}}|{LABEL}(?:\.{LABEL})*)"
+# "host tag[pid]:" or "host tag:". Without a pid, any two words before a colon
+# would match ("server listening: ..."), so the host must then contain a
+# digit, dot or hyphen (web01, db.internal, 10.0.0.7); and a level word is
+# never a tag ("app INFO: ...").
+SYSLOG_TAG = (
+    rf"(?=\S+ [^\s\[:]+\[\d+\]:|\S*[\d.-]\S* )(?P<host>{HOST}) (?!{ANY_CASE_LEVEL}[\[:])"
+    r"(?P<logger>[^\s\[:]+)(?:\[(?P<process_id>\d+)\])?:(?: |$)"
+)
+
+
+@dataclass(frozen=True)
+class LogFormat:
+    """A header pattern with named groups; group names become output keys.
+
+    With ``summary`` set, the pattern must match the whole line and the
+    output (fields plus the summary formatted from them) needs no model.
+    """
+
+    name: str
+    pattern: re.Pattern
+    summary: str | None = None
+
+
+# Tried in order; the first match wins, so more specific formats come first.
+FORMATS = (
+    LogFormat(
+        "nginx_access",
+        re.compile(
+            r'(?P<client_ip>\S+) \S+ (?P<remote_user>\S+) \[(?P<timestamp>\d{2}/\w{3}/\d{4}:\d{2}:\d{2}:\d{2} [+-]\d{4})\] '
+            r'"(?P<method>[A-Z]+) (?P<path>\S+) (?P<protocol>HTTP/[\d.]+)" (?P<status>\d{3}) (?P<bytes>\d+|-)'
+            r'(?: "(?P<referer>[^"]*)" "(?P<user_agent>[^"]*)")?\s*$'
+        ),
+        summary="{method} {path} {status}",
+    ),
+    LogFormat(
+        "nginx_error",
+        re.compile(
+            r"(?P<timestamp>\d{4}/\d{2}/\d{2} \d{2}:\d{2}:\d{2}) \[(?P<level>\w+)\] "
+            r"(?P<process_id>\d+)#(?P<thread_id>\d+): (?:\*(?P<connection_id>\d+) )?"
+        ),
+    ),
+    LogFormat(
+        "syslog_rfc5424",
+        re.compile(
+            r"<(?P<priority>\d{1,3})>1 (?P<timestamp>\S+) (?P<host>\S+) (?P<logger>\S+) (?P<process_id>\S+) "
+            r"(?P<message_id>\S+) (?:-|\[.*?\])(?: |$)"
+        ),
+    ),
+    LogFormat(
+        "log4j",
+        re.compile(
+            rf"(?P<timestamp>{ISO_DATE}[T ]{ISO_TIME})\s+\[(?P<thread_id>[^\]]+)\]\s+(?P<level>{LEVEL})\s+"
+            r"(?P<logger>[\w.$]+)\s+-\s+"
+        ),
+    ),
+    LogFormat(
+        "log4j",
+        re.compile(
+            rf"(?P<timestamp>{ISO_DATE}[T ]{ISO_TIME})\s+(?P<level>{LEVEL})\s+\[(?P<thread_id>[^\]]+)\]\s+"
+            r"(?P<logger>[\w.$]+)(?:\s+-|:)\s+"
+        ),
+    ),
+    LogFormat(
+        # journalctl -o short-iso and short-precise; plain short output is classic syslog.
+        "journald",
+        re.compile(
+            rf"(?P<timestamp>{ISO_DATE}T{ISO_TIME}|{MONTH} [ \d]\d \d{{2}}:\d{{2}}:\d{{2}}\.\d{{6}}) {SYSLOG_TAG}"
+        ),
+    ),
+    LogFormat(
+        "syslog",
+        re.compile(
+            rf"(?:<(?P<priority>\d{{1,3}})>)?(?P<timestamp>{MONTH} [ \d]\d \d{{2}}:\d{{2}}:\d{{2}}) {SYSLOG_TAG}"
+        ),
+    ),
+    LogFormat(
+        "iso8601",
+        re.compile(
+            rf"(?P<timestamp>{ISO_DATE}[T ]{ISO_TIME})\s+\[(?P<level>{ANY_CASE_LEVEL})\]:?\s+"
+            r"(?:\[(?P<process_id>\d+)\]:?\s+)?"
+        ),
+    ),
+    LogFormat(
+        "iso8601",
+        re.compile(
+            rf"(?P<timestamp>{ISO_DATE}[T ]{ISO_TIME})\s+(?:(?P<level>{LEVEL}):?\s+)?"
+            r"(?:\[(?P<process_id>\d+)\]:?\s+)?"
+        ),
+    ),
+)
+
+
+class PreExtractor:
+    """Take header fields by regex and leave only the remainder to the model.
+
+    Lines matching no format go to the model unchanged. For a match, the
+    header's fields come first in the output; the model parses the rest of
+    the line, and its fields for keys the header did not set follow, with
+    its ``@`` summary last. Complete formats, and headers with nothing
+    after them, are answered without the model.
+    """
+
+    def __init__(self, formats: Iterable[LogFormat] = FORMATS) -> None:
+        self.formats = tuple(formats)
+        self.stats = Counter()
+
+    def extract(self, line: str) -> tuple[list[tuple[str, str]], str | None] | None:
+        """(fields, remainder) for the first matching format, None if none match.
+
+        ``remainder`` is None when the line needs no model: the format is
+        complete, or nothing follows the header. Then a summary, the
+        complete format's or the header's logger or level (else the whole
+        line), is appended to ``fields``.
+        """
+        for fmt in self.formats:
+            match = fmt.pattern.match(line)
+            if match is None:
+                continue
+            self.stats[f"format_{fmt.name}"] += 1
+            groups = match.groupdict()
+            fields = [(key, value) for key, value in groups.items() if value not in ABSENT and value is not None]
+            if fmt.summary is not None:
+                fields.append((SUMMARY_KEY, fmt.summary.format_map(groups)))
+                return fields, None
+            remainder = line[match.end() :].strip()
+            if not remainder:
+                summary = next((groups[key] for key in HEADER_SUMMARY_KEYS if groups.get(key)), line.strip())
+                fields.append((SUMMARY_KEY, summary))
+                return fields, None
+            return fields, remainder
+        return None
+
+    def merge(self, fields: list[tuple[str, str]], output: str) -> str:
+        keys = {key for key, _ in fields}
+        pairs = [*fields]
+        summaries = []
+        for key, value in parse_target(output):
+            if key == SUMMARY_KEY:
+                summaries.append((key, value))
+            elif key not in keys:
+                pairs.append((key, value))
+        return "\n".join(f"{key} {value}" if value else key for key, value in pairs + summaries[:1])
+
+    def generate(
+        self, texts: Iterable[str], generate: Callable[[Iterable[str]], Iterable[str]]
+    ) -> Iterator[str]:
+        """Yield one output per text, in order; only remainders and unmatched lines reach ``generate``."""
+        texts = iter(texts)
+        while chunk := list(islice(texts, CHUNK_SIZE)):
+            found = [self.extract(text) for text in chunk]
+            todo = {}  # chunk index -> text for the model
+            for i, (text, result) in enumerate(zip(chunk, found)):
+                if result is None:
+                    todo[i] = text
+                    continue
+                fields, remainder = result
+                self.stats["pre_extract_matched"] += 1
+                self.stats["pre_extract_fields"] += len(fields)
+                if remainder is None:
+                    self.stats["pre_extract_skipped"] += 1
+                else:
+                    todo[i] = remainder
+                    self.stats["pre_extract_chars_saved"] += len(text) - len(remainder)
+            self.stats["pre_extract_lines"] += len(chunk)
+
+            outputs = dict(zip(todo, generate(todo.values())))
+            for i, result in enumerate(found):
+                if result is None:
+                    yield outputs[i]
+                else:
+                    yield self.merge(result[0], outputs.get(i, ""))
@@ -0,0 +1,110 @@
+"""Latency and throughput reports for inference.py (any backend); serve.py shares the percentiles."""
+
+from __future__ import annotations
+
+import json
+import resource
+import sys
+from collections import Counter
+from collections.abc import Mapping, Sequence
+
+PERCENTILES = (50, 90, 99)
+
+
+def summarize(values: Sequence[float]) -> dict[str, float]:
+    """p50/p90/p99 and mean of ``values`` (empty when there are none)."""
+    if not values:
+        return {}
+    ordered = sorted(values)
+    result = {
+        f"p{p}": round(ordered[min(len(ordered) - 1, int(len(ordered) * p / 100))], 3)
+        for p in PERCENTILES
+    }
+    result["mean"] = round(sum(ordered) / len(ordered), 3)
+    return result
+
+
+def _rss_mb(who: int) -> float:
+    # ru_maxrss is in KiB on Linux and in bytes on macOS.
+    peak = resource.getrusage(who).ru_maxrss
+    return round(peak / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+
+
+def _peak_rss_mb() -> float:
+    # ru_maxrss survives exec on Linux, so a process started from a large
+    # parent would report the parent's peak; VmHWM starts over at exec.
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    return round(int(line.split()[1]) / 1024, 1)
+    except OSError:
+        pass
+    return _rss_mb(resource.RUSAGE_SELF)
+
+
+def stage_hit_rates(stats: Counter) -> dict[str, float]:
+    """Share of lines each enabled short-circuit stage handled before the model."""
+    rates = {}
+    lookups = stats["cache_hits"] + stats["cache_duplicates"] + stats["cache_misses"]
+    if lookups:
+        rates["cache"] = (stats["cache_hits"] + stats["cache_duplicates"]) / lookups
+    templated = stats["template_new"] + stats["template_reused"] + stats["template_fallback"]
+    if templated:
+        rates["templates"] = stats["template_reused"] / templated
+    if stats["pre_extract_lines"]:
+        rates["pre_extract_matched"] = stats["pre_extract_matched"] / stats["pre_extract_lines"]
+        rates["pre_extract_skipped"] = stats["pre_extract_skipped"] / stats["pre_extract_lines"]
+    return {name: round(rate, 4) for name, rate in rates.items()}
+
+
+def build_report(
+    lines: int,
+    wall_seconds: float,
+    stats: Counter,
+    timings: Mapping[str, Sequence[float]],
+    config: dict,
+) -> dict:
+    """Combine run counters and per-line timings into one JSON-serializable dict.
+
+    ``timings`` holds one value per model-generated line; lines answered by
+    the result cache or template reuse appear only in ``lines``.
+    """
+    wall_seconds = max(wall_seconds, 1e-9)
+    report = {
+        "config": config,
+        "lines": lines,
+        "model_lines": len(timings.get("latency_ms", ())),
+        "wall_seconds": round(wall_seconds, 3),
+        "lines_per_second": round(lines / wall_seconds, 3),
+        "prompt_tokens": stats["prompt_tokens"],
+        "cached_prompt_tokens": stats["cached_prompt_tokens"],
+        "generated_tokens": stats["generated_tokens"],
+        "aggregate_decode_tokens_per_second": round(stats["generated_tokens"] / wall_seconds, 3),
+    }
+    if stats["draft_tokens"]:
+        report["draft_acceptance_rate"] = round(stats["draft_accepted"] / stats["draft_tokens"], 4)
+    if hit_rates := stage_hit_rates(stats):
+        report["stage_hit_rates"] = hit_rates
+    if stats["cascade_lines"]:
+        small, large = stats["cascade_small_seconds"], stats["cascade_large_seconds"]
+        report["cascade"] = {
+            "escalation_rate": round(stats["cascade_escalated"] / stats["cascade_lines"], 4),
+            "small_seconds": round(small, 3),
+            "large_seconds": round(large, 3),
+            "blended_lines_per_second": round(stats["cascade_lines"] / max(small + large, 1e-9), 3),
+        }
+    for name in ("prompt_eval_ms", "ttft_ms", "decode_tokens_per_second", "latency_ms"):
+        report[name] = summarize(timings.get(name, ()))
+    report["peak_rss_mb"] = _peak_rss_mb()
+    children = _rss_mb(resource.RUSAGE_CHILDREN)
+    if children:
+        report["peak_child_rss_mb"] = children
+    report["stats"] = dict(stats)
+    return report
+
+
+def write_report(path: str, report: dict) -> None:
+    with open(path, "w") as f:
+        json.dump(report, f, indent=2)
+        f.write("\n")
@@ -0,0 +1,210 @@
+# /// script
+# requires-python = ">=3.11"
+# dependencies = [
+#     "llama-cpp-python",
+#     "orjson",
+# ]
+# ///
+
+"""Long-running HTTP parse server over a resident model (any inference.py backend).
+
+POST /parse with a text body (one log line per line) returns
+``{"results": [{"input": ..., "output": ...}, ...]}``. Lines from concurrent
+requests are coalesced into shared decode batches. GET /metrics reports
+request latency percentiles and engine counters.
+"""
+
+import argparse
+import json
+import queue
+import threading
+import time
+import traceback
+from collections import Counter, deque
+from http import HTTPStatus
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from backends import load_backend
+from inference import add_backend_arguments, build_pipeline, micro_batches, resolve_model
+from run_report import summarize
+
+LATENCY_WINDOW = 10_000  # most recent requests kept for percentiles
+
+
+class ParseRequest:
+    def __init__(self, lines: list[str]) -> None:
+        self.lines = lines
+        self.outputs: list[str | None] = [None] * len(lines)
+        self.error: str | None = None
+        self.internal_error = False  # the server failed, not the input
+        self.remaining = len(lines)
+        self.done = threading.Event()
+
+    def resolve(self, index: int, output: str | None, error: str | None = None, internal: bool = False) -> None:
+        self.outputs[index] = output
+        self.error = self.error or error
+        self.internal_error = self.internal_error or internal
+        self.remaining -= 1
+        if self.remaining == 0:
+            self.done.set()
+
+
+class Batcher:
+    """Single thread that owns the model and drains the shared line queue."""
+
+    def __init__(self, generate, stages: list, max_batch: int, max_wait: float) -> None:
+        self.generate = generate
+        self.stages = stages
+        self.max_batch = max_batch
+        self.max_wait = max_wait
+        self.queue: queue.Queue[tuple[ParseRequest, int] | None] = queue.Queue(maxsize=4 * max_batch)
+        self.latencies: deque[float] = deque(maxlen=LATENCY_WINDOW)
+        self.counters = Counter()
+        self.lock = threading.Lock()
+        threading.Thread(target=self._run, daemon=True).start()
+
+    def submit(self, lines: list[str]) -> ParseRequest:
+        request = ParseRequest(lines)
+        for i in range(len(lines)):
+            self.queue.put((request, i))
+        return request
+
+    def record(self, seconds: float, n_lines: int) -> None:
+        with self.lock:
+            self.latencies.append(seconds)
+            self.counters["requests"] += 1
+            self.counters["lines"] += n_lines
+
+    def _run(self) -> None:
+        for batch in micro_batches(iter(self.queue.get, None), self.max_batch, self.max_wait):
+            with self.lock:
+                self.counters["batches"] += 1
+            lines = [request.lines[i] for request, i in batch]
+            try:
+                outputs = list(self.generate(lines))
+            except ValueError:
+                # Isolate the offending line(s) so the rest of the batch still succeeds.
+                for request, i in batch:
+                    try:
+                        request.resolve(i, next(iter(self.generate([request.lines[i]]))))
+                    except ValueError as e:
+                        request.resolve(i, None, str(e))
+                    except Exception as e:
+                        self._fail([(request, i)], e)
+                continue
+            except Exception as e:
+                # A cache or decode failure; fail this batch but keep serving.
+                self._fail(batch, e)
+                continue
+            for (request, i), output in zip(batch, outputs):
+                request.resolve(i, output)
+
+    def _fail(self, batch: list[tuple[ParseRequest, int]], error: Exception) -> None:
+        traceback.print_exception(error)
+        with self.lock:
+            self.counters["errors"] += 1
+        for request, i in batch:
+            request.resolve(i, None, f"{type(error).__name__}: {error}", internal=True)
+
+    def metrics(self) -> dict:
+        with self.lock:
+            latencies = [seconds * 1000 for seconds in self.latencies]
+            counters = dict(self.counters)
+        # dict.copy is atomic under the GIL, so the batcher can keep counting meanwhile.
+        stats = sum((Counter(dict.copy(stage.stats)) for stage in self.stages), Counter())
+        result = {**counters, **stats}
+        # The same percentiles as the --report of inference.py.
+        for name, value in summarize(latencies).items():
+            result[f"latency_{name}_ms"] = value
+        if counters.get("batches"):
+            result["lines_per_batch"] = round(counters["lines"] / counters["batches"], 2)
+        return result
+
+
+def make_handler(batcher: Batcher) -> type[BaseHTTPRequestHandler]:
+    class Handler(BaseHTTPRequestHandler):
+        def _send_json(self, status: HTTPStatus, payload: dict) -> None:
+            body = json.dumps(payload).encode()
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def do_GET(self) -> None:
+            if self.path == "/metrics":
+                self._send_json(HTTPStatus.OK, batcher.metrics())
+            elif self.path == "/health":
+                self._send_json(HTTPStatus.OK, {"status": "ok"})
+            else:
+                self._send_json(HTTPStatus.NOT_FOUND, {"error": f"unknown path {self.path}"})
+
+        def do_POST(self) -> None:
+            if self.path != "/parse":
+                self._send_json(HTTPStatus.NOT_FOUND, {"error": f"unknown path {self.path}"})
+                return
+            start = time.perf_counter()
+            length = int(self.headers.get("Content-Length", 0))
+            body = self.rfile.read(length).decode("utf-8", errors="replace")
+            lines = [line for line in body.splitlines() if line.strip()]
+            if not lines:
+                self._send_json(HTTPStatus.BAD_REQUEST, {"error": "request body has no log lines"})
+                return
+
+            request = batcher.submit(lines)
+            request.done.wait()
+            if request.error:
+                status = HTTPStatus.INTERNAL_SERVER_ERROR if request.internal_error else HTTPStatus.UNPROCESSABLE_ENTITY
+                self._send_json(status, {"error": request.error})
+                return
+            batcher.record(time.perf_counter() - start, len(lines))
+            results = [{"input": line, "output": out} for line, out in zip(lines, request.outputs)]
+            self._send_json(HTTPStatus.OK, {"results": results})
+
+        def log_message(self, format: str, *args) -> None:
+            pass  # per-request access logs would dominate stderr under load
+
+    return Handler
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Serve log parsing over HTTP with dynamic batching.")
+    add_backend_arguments(parser)
+    parser.add_argument("--host", default="127.0.0.1", help="Address to bind (default: 127.0.0.1).")
+    parser.add_argument("--port", type=int, default=8080, help="Port to listen on (default: 8080).")
+    parser.add_argument(
+        "--max-batch",
+        type=int,
+        default=32,
+        help="Most lines coalesced into one decode batch (default: 32).",
+    )
+    parser.add_argument(
+        "--max-wait",
+        type=float,
+        default=0.01,
+        help="Seconds the first queued line waits for others to join its batch (default: 0.01).",
+    )
+    args = parser.parse_args()
+    resolve_model(parser, args)
+
+    print(f"Loading model: {args.model}")
+    try:
+        backend = load_backend(args)
+    except ValueError as e:
+        parser.error(str(e))
+    generate, stages = build_pipeline(args, backend)
+    batcher = Batcher(generate, stages, args.max_batch, args.max_wait)
+
+    server = ThreadingHTTPServer((args.host, args.port), make_handler(batcher))
+    print(f"Listening on http://{args.host}:{args.port} (POST /parse, GET /metrics)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+    print("\nDone.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,90 @@
+"""Span-pointer target encoding: values copied from the log line become ``start:end`` offsets.
+
+An encoded target keeps the ``key value`` line layout, but a value that is a
+substring of the input text may be written as character offsets into that
+text, e.g. ``url 31:88``, when the pointer costs fewer target tokens than the
+value. Literal values that would read as a pointer are escaped with a leading
+backslash. The ``@`` summary line is never encoded.
+"""
+
+from __future__ import annotations
+
+import re
+from collections import deque
+from collections.abc import Callable, Iterable, Iterator
+
+from targets import SUMMARY_KEY
+
+# Without a tokenizer, values shorter than this stay literal: a tokenizer that
+# splits digits spends as many tokens on "40:55" as on "localhost".
+MIN_POINTED_CHARS = 16
+POINTER_RE = re.compile(r"(\d+):(\d+)")
+ESCAPED_RE = re.compile(r"\\+\d+:\d+")
+
+
+def _find(text: str, value: str, cursor: int) -> int:
+    # Targets list fields roughly left to right, so prefer a match after the previous one.
+    pos = text.find(value, cursor)
+    return pos if pos != -1 else text.find(value)
+
+
+def _cheaper(pointer: str, value: str, count_tokens: Callable[[str], int] | None) -> bool:
+    if count_tokens is None:
+        return len(value) >= MIN_POINTED_CHARS and len(pointer) < len(value)
+    # Values follow the key after a space, which most tokenizers merge into the first token.
+    return count_tokens(" " + pointer) < count_tokens(" " + value)
+
+
+def encode_target(text: str, target: str, count_tokens: Callable[[str], int] | None = None) -> str:
+    """Rewrite every value of ``target`` found in ``text`` as offsets, when cheaper.
+
+    ``count_tokens`` measures a string in the trained model's tokens; without
+    it, only values of at least MIN_POINTED_CHARS characters are replaced.
+    """
+    out_lines = []
+    cursor = 0
+    for line in target.split("\n"):
+        key, sep, value = line.partition(" ")
+        if key != SUMMARY_KEY and value:
+            pos = _find(text, value, cursor)
+            pointer = f"{pos}:{pos + len(value)}"
+            if pos != -1 and _cheaper(pointer, value, count_tokens):
+                out_lines.append(f"{key} {pointer}")
+                cursor = pos + len(value)
+                continue
+        if key != SUMMARY_KEY and (POINTER_RE.fullmatch(value) or ESCAPED_RE.fullmatch(value)):
+            value = "\\" + value
+        out_lines.append(f"{key}{sep}{value}")
+    return "\n".join(out_lines)
+
+
+def decode_target(text: str, encoded: str) -> str:
+    """Expand the offsets in an encoded target back into ``key value`` lines.
+
+    Pointers that fall outside ``text`` are left as generated.
+    """
+    out_lines = []
+    for line in encoded.split("\n"):
+        key, sep, value = line.partition(" ")
+        if key != SUMMARY_KEY:
+            if m := POINTER_RE.fullmatch(value):
+                start, end = int(m[1]), int(m[2])
+                if start < end <= len(text):
+                    value = text[start:end]
+            elif ESCAPED_RE.fullmatch(value):
+                value = value[1:]
+        out_lines.append(f"{key}{sep}{value}")
+    return "\n".join(out_lines)
+
+
+def expand(texts: Iterable[str], generate: Callable[[Iterable[str]], Iterable[str]]) -> Iterator[str]:
+    """Yield the decoded outputs of ``generate`` for ``texts``, in order."""
+    pending: deque[str] = deque()
+
+    def source() -> Iterator[str]:
+        for text in texts:
+            pending.append(text)
+            yield text
+
+    for output in generate(source()):
+        yield decode_target(pending.popleft(), output)
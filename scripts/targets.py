@@ -0,0 +1,15 @@
+"""The ``key value`` target format: one field per line, then the ``@`` summary line."""
+
+from __future__ import annotations
+
+from collections.abc import Iterator
+
+SUMMARY_KEY = "@"
+
+
+def parse_target(output: str) -> Iterator[tuple[str, str]]:
+    """Yield ``(key, value)`` for every non-empty line of a target."""
+    for line in output.split("\n"):
+        key, _, value = line.partition(" ")
+        if key:
+            yield key, value
@@ -0,0 +1,90 @@
+#!/usr/bin/env python3
+"""Tests for scripts/backends."""
+from __future__ import annotations
+
+import argparse
+import importlib.util
+import sys
+import unittest
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+from backends import Backend, generate_bucketed, load_backend, reject_options  # noqa: E402
+
+
+class Recording(Backend):
+    def __init__(self, batch_size):
+        super().__init__()
+        self.batch_size = batch_size
+        self.batches = []
+
+    def generate_batch(self, texts):
+        self.batches.append(texts)
+        return [text.upper() for text in texts]
+
+
+def mock_args(**overrides):
+    return argparse.Namespace(**({"backend": "mock", "parallel": 2, "mock_latency": 0.0} | overrides))
+
+
+class TestBackend(unittest.TestCase):
+    def test_generate_batches_stream_in_order(self):
+        backend = Recording(batch_size=2)
+        self.assertEqual(list(backend.generate(iter("abcde"))), list("ABCDE"))
+        self.assertEqual(backend.batches, [["a", "b"], ["c", "d"], ["e"]])
+
+    def test_bucketed_batches_by_length_in_input_order(self):
+        batches = []
+
+        def run(encoded):
+            batches.append([len(e) for e in encoded])
+            return ["".join(e) for e in encoded]
+
+        texts = ["bb", "a", "dddd", "ccc", "e"]
+        self.assertEqual(list(generate_bucketed(texts, list, run, batch_size=2)), texts)
+        self.assertEqual(batches, [[4, 3], [2, 1], [1]])
+
+    def test_mock_is_deterministic_and_lazy(self):
+        backend = load_backend(mock_args())
+        texts = ["pid=7 user: root started", "no fields"]
+        outputs = list(backend.generate(texts))
+        self.assertEqual(outputs, ["pid 7\nuser root\n@ pid=7 user: root started", "@ no fields"])
+        self.assertEqual(list(backend.generate(texts)), outputs)
+        self.assertEqual(backend.stats["mock_batches"], 2)
+        for module in ("torch", "llama_cpp", "vllm"):
+            self.assertNotIn(module, sys.modules)
+
+    def test_reject_options(self):
+        args = argparse.Namespace(backend="vllm", grammar=True, kv_size=None)
+        with self.assertRaisesRegex(ValueError, "--grammar not supported by the vllm backend"):
+            reject_options(args, "grammar", "kv_size")
+
+    def test_reject_precision_only_when_not_fp32(self):
+        reject_options(argparse.Namespace(backend="vllm", precision="fp32"), "precision")
+        with self.assertRaisesRegex(ValueError, "--precision not supported"):
+            reject_options(argparse.Namespace(backend="vllm", precision="int8"), "precision")
+
+    def test_reject_temperature_only_when_sampling_is_asked_for(self):
+        for temperature in (0.1, 0.0):
+            reject_options(argparse.Namespace(backend="seq2seq", temperature=temperature), "temperature")
+        with self.assertRaisesRegex(ValueError, "--temperature not supported by the seq2seq backend"):
+            reject_options(argparse.Namespace(backend="seq2seq", temperature=0.7), "temperature")
+
+
+# After TestBackend, which checks that the mock backend imports no runtime.
+@unittest.skipUnless(importlib.util.find_spec("llama_cpp"), "needs llama-cpp-python")
+class TestLlamaCppOptions(unittest.TestCase):
+    def test_torch_options_rejected_before_loading(self):
+        from inference import add_backend_arguments
+
+        parser = argparse.ArgumentParser()
+        add_backend_arguments(parser)
+        for option in (["--compile"], ["--precision", "int8"], ["--precision", "bf16"]):
+            for backend in ("llama.cpp", "cascade"):
+                args = parser.parse_args(["-b", backend, "-m", "missing.gguf", "--escalate-model", "x.gguf", *option])
+                with self.assertRaisesRegex(ValueError, f"{option[0]} not supported by the {backend} backend"):
+                    load_backend(args)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,88 @@
+#!/usr/bin/env python3
+"""Tests for scripts/backends/cascade.py."""
+from __future__ import annotations
+
+import argparse
+import importlib.util
+import math
+import sys
+import tempfile
+import unittest
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+from backends.cascade import confidence  # noqa: E402
+from test_gguf_engine import LINES, tiny_gguf  # noqa: E402
+
+LINE = "2024-01-28 12:24:48 ERROR [763] worker-5 heartbeat failed"
+OUTPUT = "timestamp 2024-01-28 12:24:48\nlevel ERROR\nprocess_id 763\n@ heartbeat failed"
+
+
+class TestConfidence(unittest.TestCase):
+    def test_mean_token_probability(self):
+        logprobs = [math.log(0.9), math.log(0.4)]
+        self.assertAlmostEqual(confidence(LINE, OUTPUT, logprobs), 0.6)
+
+    def test_values_missing_from_line(self):
+        output = OUTPUT.replace("763", "764")
+        self.assertAlmostEqual(confidence(LINE, output, [0.0]), 2 / 3)
+
+    def test_malformed_outputs_score_zero(self):
+        for output in (
+            OUTPUT.rsplit("\n", 1)[0],  # no summary, e.g. cut off at --max-tokens
+            OUTPUT.replace("level ERROR", "level"),
+            OUTPUT.replace("process_id", "level"),  # duplicate key
+            OUTPUT + "\n@ again",
+        ):
+            self.assertEqual(confidence(LINE, output, [0.0]), 0.0, output)
+
+    def test_summary_only(self):
+        self.assertEqual(confidence(LINE, "@ heartbeat failed", [0.0]), 1.0)
+
+
+@unittest.skipUnless(
+    importlib.util.find_spec("llama_cpp") and importlib.util.find_spec("gguf"), "needs llama-cpp-python and gguf"
+)
+class TestCascadeBackend(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        from inference import add_backend_arguments
+
+        cls.tmp = tempfile.TemporaryDirectory()
+        cls.small, cls.large = (str(Path(cls.tmp.name) / name) for name in ("small.gguf", "large.gguf"))
+        tiny_gguf(cls.small, seed=0)
+        tiny_gguf(cls.large, seed=1)
+        cls.parser = argparse.ArgumentParser()
+        add_backend_arguments(cls.parser)
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.tmp.cleanup()
+
+    def run_backend(self, *options):
+        from backends import load_backend
+
+        args = self.parser.parse_args(["-p", "4", "--temperature", "0", "--max-tokens", "24", "--n-ctx", "2048", *options])
+        backend = load_backend(args, n_threads=2)
+        return backend, list(backend.generate(LINES))
+
+    def test_threshold_decides_which_model_answers(self):
+        _, small_only = self.run_backend("-b", "llama.cpp", "-m", self.small)
+        _, large_only = self.run_backend("-b", "llama.cpp", "-m", self.large)
+        self.assertNotEqual(small_only, large_only)
+        cascade = ["-b", "cascade", "-m", self.small, "--escalate-model", self.large]
+
+        backend, outputs = self.run_backend(*cascade, "--escalate-below", "0")
+        self.assertEqual(outputs, small_only)
+        self.assertEqual(backend.stats["cascade_escalated"], 0)
+
+        # Confidence never exceeds 1, so every line is escalated.
+        backend, outputs = self.run_backend(*cascade, "--escalate-below", "1.1")
+        self.assertEqual(outputs, large_only)
+        self.assertEqual(backend.stats["cascade_escalated"], len(LINES))
+        self.assertEqual(len(backend.timings["latency_ms"]), len(LINES))
+        self.assertFalse(backend.large.timings)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,112 @@
+#!/usr/bin/env python3
+"""Tests for scripts/export_onnx.py and the onnx backend, on a tiny random ByT5."""
+from __future__ import annotations
+
+import argparse
+import importlib.util
+import sys
+import tempfile
+import unittest
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+HAVE_DEPS = all(importlib.util.find_spec(name) for name in ("torch", "transformers", "onnxruntime"))
+LINES = [
+    "Jan  1 00:00:00 host sshd[42]: Accepted password for root",
+    "level=info msg=ok",
+    "2024-05-01T12:00:00Z GET /index.html 200 <extra_id_99> 1532",
+]
+
+
+def tiny_byt5(path: str) -> None:
+    import torch
+    from transformers import ByT5Tokenizer, T5Config, T5ForConditionalGeneration
+
+    torch.manual_seed(0)
+    tokenizer = ByT5Tokenizer()
+    config = T5Config(
+        vocab_size=len(tokenizer), d_model=32, d_kv=8, d_ff=64, num_layers=2, num_heads=4,
+        decoder_start_token_id=0, pad_token_id=0, eos_token_id=1, tie_word_embeddings=False,
+    )
+    model = T5ForConditionalGeneration(config).eval()
+    with torch.no_grad():
+        # Random weights repeat one token, pad included. Rule out pad and unk, and
+        # make EOS outscore the token the first line starts with, so rows finish
+        # at different steps. (The head is tied to the input embeddings.)
+        model.lm_head.weight[[0, 2]] = 0
+        generated = model.generate(**tokenizer(LINES[0], return_tensors="pt"), max_new_tokens=1, do_sample=False)
+        model.lm_head.weight[1] = model.lm_head.weight[generated[0, 1]] * 1.01
+    model.save_pretrained(path)
+    tokenizer.save_pretrained(path)
+
+
+@unittest.skipUnless(HAVE_DEPS, "needs torch, transformers and onnxruntime")
+class TestExportOnnx(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.tmp = tempfile.TemporaryDirectory()
+        cls.model_dir = f"{cls.tmp.name}/model"
+        cls.onnx_dir = f"{cls.tmp.name}/onnx"
+        tiny_byt5(cls.model_dir)
+
+        from export_onnx import export
+
+        export(cls.model_dir, cls.onnx_dir)
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.tmp.cleanup()
+
+    def args(self, **overrides):
+        return argparse.Namespace(**({
+            "backend": "onnx", "model": self.onnx_dir, "parallel": 2, "n_ctx": 512, "max_tokens": 12,
+            "precision": "fp32", "grammar": False, "kv_size": None, "budget_ratio": None,
+            "fit_budget": None, "compile": False, "draft": 0, "temperature": 0.1,
+        } | overrides))
+
+    def test_byte_tokenizer_matches_transformers(self):
+        from transformers import AutoTokenizer
+
+        from backends.ort import ByteTokenizer
+
+        reference = AutoTokenizer.from_pretrained(self.model_dir)
+        tokenizer = ByteTokenizer(f"{self.onnx_dir}/tokenizer_config.json")
+        for line in [*LINES, "a <unk> b </s> é", ""]:
+            ids = reference(line)["input_ids"]
+            self.assertEqual(tokenizer.encode(line), ids)
+            self.assertEqual(tokenizer.decode(ids), reference.decode(ids, skip_special_tokens=True))
+
+    def test_matches_pytorch_greedy_decoding(self):
+        import torch
+        from transformers import AutoModelForSeq2SeqLM, AutoTokenizer
+
+        from backends import load_backend
+
+        tokenizer = AutoTokenizer.from_pretrained(self.model_dir)
+        model = AutoModelForSeq2SeqLM.from_pretrained(self.model_dir)
+        inputs = tokenizer(LINES, padding=True, return_tensors="pt")
+        with torch.no_grad():
+            generated = model.generate(**inputs, max_new_tokens=12, do_sample=False)
+        expected = tokenizer.batch_decode(generated, skip_special_tokens=True)
+
+        backend = load_backend(self.args())
+        self.assertEqual(list(backend.generate(LINES)), expected)
+        self.assertGreater(backend.stats["generated_tokens"], 0)
+
+    def test_precision_is_fixed_at_export(self):
+        from backends import load_backend
+
+        with self.assertRaises(ValueError):
+            load_backend(self.args(precision="int8"))
+
+    def test_sampling_is_rejected(self):
+        from backends import load_backend
+
+        load_backend(self.args(temperature=0.0))
+        with self.assertRaisesRegex(ValueError, "--temperature not supported by the onnx backend"):
+            load_backend(self.args(temperature=0.8))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,198 @@
+#!/usr/bin/env python3
+"""Tests for scripts/gguf_engine.py on a tiny random GGUF model."""
+from __future__ import annotations
+
+import importlib.util
+import sys
+import tempfile
+import unittest
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+LINES = [
+    "2024-01-28 12:24:48 ERROR [763] worker-5 heartbeat failed",
+    "a=1",
+    "Jan  1 00:00:00 host sshd[42]: Accepted publickey for bob from 10.0.0.7 port 52811",
+    "user=root action=login status=ok",
+    "INFO",
+    "GET /index.html 200 1534 time=0.25",
+    "level=warn msg=retrying attempt=3 of 5",
+    "x",
+]
+
+
+def tiny_gguf(path: str, seed: int = 0, successors: dict[str, list[str]] | None = None) -> None:
+    """Write a random 2-layer llama GGUF with a byte-fallback vocabulary and a ChatML template.
+
+    With ``successors`` (token -> preferred next tokens, best first) the blocks
+    add nothing to the residual stream, so the model is a bigram model that
+    ranks those tokens above all others after each key token.
+    """
+    import gguf
+    import numpy as np
+
+    rng = np.random.default_rng(seed)
+    tokens, scores, types = ["<unk>", "<s>", "</s>", "<|im_start|>", "<|im_end|>"], [0.0] * 5, [2, 3, 3, 3, 3]
+    tokens += [f"<0x{b:02X}>" for b in range(256)]
+    scores += [0.0] * 256
+    types += [6] * 256
+    pieces = [c.replace(" ", "▁") for c in "abcdefghijklmnopqrstuvwxyzABCDEFGHIJKLMNOPQRSTUVWXYZ0123456789:.-_/[]=@ "]
+    pieces += ["▁key", "▁value", "▁ERROR", "▁INFO", "time", "stamp", "level", "▁log", "▁ERROR\n"]
+    tokens += pieces
+    scores += [-1.0] * len(pieces)
+    types += [1] * len(pieces)
+
+    n_embd, n_head, n_layer, n_ff = 64, 4, 2, 128
+    writer = gguf.GGUFWriter(path, "llama")
+    writer.add_context_length(4096)
+    writer.add_embedding_length(n_embd)
+    writer.add_block_count(n_layer)
+    writer.add_feed_forward_length(n_ff)
+    writer.add_head_count(n_head)
+    writer.add_head_count_kv(n_head)
+    writer.add_rope_dimension_count(n_embd // n_head)
+    writer.add_layer_norm_rms_eps(1e-5)
+    writer.add_file_type(0)
+    writer.add_tokenizer_model("llama")
+    writer.add_token_list(tokens)
+    writer.add_token_scores(scores)
+    writer.add_token_types(types)
+    writer.add_bos_token_id(1)
+    writer.add_eos_token_id(4)
+    writer.add_unk_token_id(0)
+    writer.add_add_bos_token(False)
+    writer.add_chat_template(
+        "{% for m in messages %}<|im_start|>{{ m['role'] }}\n{{ m['content'] }}<|im_end|>\n{% endfor %}"
+        "{% if add_generation_prompt %}<|im_start|>assistant\n{% endif %}"
+    )
+
+    def weight(name, *shape, scale=0.3):
+        tensor = (rng.standard_normal(shape[::-1]) * scale).astype(np.float32)
+        if successors is not None and name.endswith(("attn_output.weight", "ffn_down.weight")):
+            tensor[:] = 0.0
+        writer.add_tensor(name, tensor)
+        return tensor
+
+    embeddings = weight("token_embd.weight", n_embd, len(tokens), scale=1.0)
+    for i in range(n_layer):
+        writer.add_tensor(f"blk.{i}.attn_norm.weight", np.ones(n_embd, dtype=np.float32))
+        writer.add_tensor(f"blk.{i}.ffn_norm.weight", np.ones(n_embd, dtype=np.float32))
+        for name in ("attn_q", "attn_k", "attn_v", "attn_output"):
+            weight(f"blk.{i}.{name}.weight", n_embd, n_embd)
+        weight(f"blk.{i}.ffn_gate.weight", n_embd, n_ff)
+        weight(f"blk.{i}.ffn_up.weight", n_embd, n_ff)
+        weight(f"blk.{i}.ffn_down.weight", n_ff, n_embd)
+    writer.add_tensor("output_norm.weight", np.ones(n_embd, dtype=np.float32))
+    if successors is None:
+        weight("output.weight", n_embd, len(tokens), scale=8.0)
+    else:
+        # The final norm scales each embedding to norm sqrt(n_embd); a row along
+        # that direction scores ~20 / (rank + 1) for its successors, ~0 elsewhere.
+        ids = {token: i for i, token in enumerate(tokens)} | {"\n": tokens.index("<0x0A>")}
+        output = np.zeros((len(tokens), n_embd), dtype=np.float32)
+        for token, nexts in successors.items():
+            direction = embeddings[ids[token]] / np.linalg.norm(embeddings[ids[token]]) / np.sqrt(n_embd)
+            for rank, following in enumerate(nexts):
+                output[ids[following]] += 20.0 / (rank + 1) * direction
+        writer.add_tensor("output.weight", output)
+    writer.write_header_to_file()
+    writer.write_kv_data_to_file()
+    writer.write_tensors_to_file()
+    writer.close()
+
+
+@unittest.skipUnless(
+    importlib.util.find_spec("llama_cpp") and importlib.util.find_spec("gguf"), "needs llama-cpp-python and gguf"
+)
+class TestBatchEngine(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.tmp = tempfile.TemporaryDirectory()
+        cls.model = str(Path(cls.tmp.name) / "tiny.gguf")
+        tiny_gguf(cls.model)
+        cls.expected = list(cls.engine(n_parallel=1).generate(LINES))
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.tmp.cleanup()
+
+    @classmethod
+    def engine(cls, **kwargs):
+        from gguf_engine import BatchEngine
+
+        # Batch layouts round differently (the KV cache is f16), so keep generations
+        # short enough that no greedy choice of the random model is a near tie.
+        options = {"n_ctx": 256, "n_threads": 2, "max_tokens": 24, "temperature": 0.0} | kwargs
+        return BatchEngine(cls.model, "Parse the log line.", **options)
+
+    def test_parallel_slots_keep_input_order(self):
+        engine = self.engine(n_parallel=4)
+        self.assertEqual(list(engine.generate(LINES)), self.expected)
+        # Every prompt reuses the system prompt prefilled once in the prefix sequence.
+        self.assertEqual(engine.stats["cached_prompt_tokens"], len(engine.prefix_tokens) * len(LINES))
+        self.assertGreater(engine.stats["cached_prompt_tokens"], 0)
+
+    def test_small_kv_pool_admits_fewer_slots(self):
+        engine = self.engine(n_parallel=4, kv_size=256)
+        self.assertEqual(list(engine.generate(LINES)), self.expected)
+        self.assertEqual(engine.free_cells, engine.kv_size)
+
+    def test_truncated_budgets_extend_or_retry(self):
+        for kv_size in (None, 256):
+            engine = self.engine(n_parallel=4, kv_size=kv_size, budget_ratio=0.01)
+            self.assertEqual(list(engine.generate(LINES)), self.expected)
+            self.assertGreater(engine.stats["budget_extended"] + engine.stats["budget_retried"], 0)
+            self.assertEqual(engine.free_cells, engine.kv_size)
+
+    def test_draft_matches_plain_decoding(self):
+        for n_parallel in (1, 4):
+            engine = self.engine(n_parallel=n_parallel, n_draft=4)
+            self.assertEqual(list(engine.generate(LINES)), self.expected)
+            self.assertGreater(engine.stats["draft_tokens"], 0)
+
+    def test_logprobs_do_not_change_outputs(self):
+        results = list(self.engine(n_parallel=4).generate_with_logprobs(LINES))
+        self.assertEqual([output for output, _ in results], self.expected)
+        self.assertTrue(all(logprobs and max(logprobs) <= 0.0 for _, logprobs in results))
+
+    def test_budget_must_leave_room_for_input(self):
+        from line_chunks import LineChunker
+
+        with self.assertRaisesRegex(ValueError, "leaves no room for input"):
+            self.engine(max_tokens=256)
+        line = LINES[0][:48]
+        self.assertEqual(LineChunker(self.engine().fits).split(line), [(0, len(line))])
+
+
+@unittest.skipUnless(
+    importlib.util.find_spec("llama_cpp") and importlib.util.find_spec("gguf"), "needs llama-cpp-python and gguf"
+)
+class TestTargetGrammar(unittest.TestCase):
+    def test_grammar_stops_after_the_summary_line(self):
+        from backends.llama_cpp import TARGET_GRAMMAR
+        from gguf_engine import BatchEngine
+
+        # Left alone, this model repeats "level ERROR\n@ log\n" until --max-tokens.
+        successors = {
+            "\n": ["level"],
+            "level": ["▁ERROR\n"],
+            "▁ERROR\n": ["@"],
+            "@": ["▁log"],
+            "▁log": ["\n", "<|im_end|>"],
+        }
+        with tempfile.TemporaryDirectory() as tmp:
+            model = str(Path(tmp) / "bigram.gguf")
+            tiny_gguf(model, successors=successors)
+            options = {"n_ctx": 256, "n_threads": 2, "n_parallel": 4, "max_tokens": 48, "temperature": 0.0}
+            free = list(BatchEngine(model, "Parse the log line.", **options).generate(LINES))
+            constrained = BatchEngine(model, "Parse the log line.", grammar=TARGET_GRAMMAR, **options)
+            outputs = list(constrained.generate(LINES))
+        self.assertTrue(all(output.count("@ log") > 1 for output in free))
+        for output in outputs:
+            self.assertRegex(output, r"\A(?:[^ \t\r\n@][^ \t\r\n]* [^\n]*\n)*@ [^\n]*\Z")
+        self.assertEqual(outputs, ["level ERROR\n@ log"] * len(LINES))
+
+
+if __name__ == "__main__":
+    unittest.main()
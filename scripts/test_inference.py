@@ -0,0 +1,190 @@
+#!/usr/bin/env python3
+"""Tests for scripts/inference.py (mock backend)."""
+from __future__ import annotations
+
+import argparse
+import json
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import unittest
+from pathlib import Path
+
+SCRIPTS = Path(__file__).resolve().parent
+sys.path.insert(0, str(SCRIPTS))
+from backends.mock import parse  # noqa: E402
+from inference import add_backend_arguments, micro_batches, open_cache  # noqa: E402
+
+INFERENCE = [sys.executable, str(SCRIPTS / "inference.py")]
+
+
+def write_input(path: Path, n_lines: int) -> None:
+    with open(path, "w") as f:
+        for i in range(n_lines):
+            f.write(json.dumps({"input": f"2024-01-28 12:{i % 60:02d}:00 pid={i} user=u{i % 7} msg=request {i} served"}) + "\n")
+
+
+class TestMicroBatches(unittest.TestCase):
+    def test_batches_close_at_max_batch(self):
+        self.assertEqual(list(micro_batches(iter("abcdefghij"), 4, 10.0)), [list("abcd"), list("efgh"), list("ij")])
+
+    def test_batches_close_at_max_wait(self):
+        def lines():
+            yield from "ab"
+            time.sleep(0.5)
+            yield from "cd"
+
+        start = time.monotonic()
+        self.assertEqual(list(micro_batches(lines(), 10, 0.05)), [list("ab"), list("cd")])
+        self.assertLess(time.monotonic() - start, 5.0)  # end of input does not wait for a fuller batch
+
+
+class TestOpenCache(unittest.TestCase):
+    def test_escalate_model_contents_key_the_cache(self):
+        parser = argparse.ArgumentParser()
+        add_backend_arguments(parser)
+        with tempfile.TemporaryDirectory() as tmp:
+            small, large = Path(tmp) / "small.gguf", Path(tmp) / "large.gguf"
+            small.write_bytes(b"small weights")
+            large.write_bytes(b"large weights")
+            args = parser.parse_args(
+                ["-b", "cascade", "-m", str(small), "--escalate-model", str(large), "--cache", f"{tmp}/cache.db"]
+            )
+            before = open_cache(args).namespace
+            large.write_bytes(b"large weights, re-quantized")
+            self.assertNotEqual(open_cache(args).namespace, before)
+
+
+class TestStream(unittest.TestCase):
+    def stream(self, stdin, *options):
+        args = ["-b", "mock", "--stream", *options]
+        result = subprocess.run([*INFERENCE, *args], input=stdin, capture_output=True, text=True, timeout=60)
+        self.assertEqual(result.returncode, 0, result.stderr)
+        return [json.loads(line) for line in result.stdout.splitlines()]
+
+    def test_raw_lines(self):
+        lines = [f"pid={i} user=u{i}" for i in range(70)]
+        stdin = "\r\n".join(lines[:3]) + "\n\n   \n" + "\n".join(lines[3:]) + "\n"
+        records = self.stream(stdin, "--max-batch", "8")
+        self.assertEqual(records, [{"input": line, "predicted": parse(line)} for line in lines])
+
+    def test_jsonl_records_keep_their_fields(self):
+        records = [{"id": i, "message": f"status={i}"} for i in range(5)]
+        stdin = "".join(json.dumps(record) + "\n" for record in records)
+        options = ["--stream-format", "jsonl", "--input-key", "message", "--output-key", "parsed"]
+        expected = [record | {"parsed": parse(record["message"])} for record in records]
+        self.assertEqual(self.stream(stdin, *options), expected)
+
+    def test_partial_batch_is_answered_while_stdin_is_open(self):
+        args = ["-b", "mock", "--stream", "--max-batch", "32", "--max-wait", "0.05"]
+        proc = subprocess.Popen(
+            [*INFERENCE, *args], stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, text=True
+        )
+        timer = threading.Timer(60, proc.kill)
+        timer.start()
+        try:
+            proc.stdin.write("a=1\n")
+            proc.stdin.flush()
+            self.assertEqual(json.loads(proc.stdout.readline()), {"input": "a=1", "predicted": parse("a=1")})
+            proc.stdin.close()
+            self.assertEqual(proc.wait(), 0)
+        finally:
+            timer.cancel()
+            proc.kill()
+            proc.stdout.close()
+
+
+class TestWorkers(unittest.TestCase):
+    def test_backend_load_failure_fails_the_run(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            tmp = Path(tmp)
+            model = tmp / "broken.gguf"
+            model.write_bytes(b"not a gguf file")
+            (tmp / "in.jsonl").write_text(json.dumps({"input": "a=1"}) + "\n")
+            args = ["-b", "llama.cpp", "-m", str(model), "-w", "2", "-i", str(tmp / "in.jsonl"), "-o", str(tmp / "out.jsonl")]
+            result = subprocess.run([*INFERENCE, *args], capture_output=True, text=True, timeout=120)
+            self.assertNotEqual(result.returncode, 0)
+
+    def test_output_budget_must_fit_the_context(self):
+        args = ["-b", "llama.cpp", "-m", "model.gguf", "--n-ctx", "1024", "--max-tokens", "1024", "--chunk-long-lines"]
+        result = subprocess.run([*INFERENCE, *args], capture_output=True, text=True, timeout=60)
+        self.assertEqual(result.returncode, 2)
+        self.assertIn("--max-tokens (1024) must be below --n-ctx (1024)", result.stderr)
+
+
+
+class TestResume(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.tmp = tempfile.TemporaryDirectory()
+        cls.input = Path(cls.tmp.name) / "in.jsonl"
+        write_input(cls.input, 6000)  # about 600 KB, three worker shards
+        cls.output = Path(cls.tmp.name) / "out.jsonl"
+        cls.run_inference()
+        cls.expected = cls.output.read_bytes()
+        cls.input_lines = cls.input.read_bytes().splitlines(keepends=True)
+        cls.records = cls.expected.splitlines(keepends=True)
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.tmp.cleanup()
+
+    @classmethod
+    def run_inference(cls, *options):
+        args = ["-b", "mock", "-i", str(cls.input), "-o", str(cls.output), *options]
+        result = subprocess.run([*INFERENCE, *args], capture_output=True, text=True, timeout=120)
+        if result.returncode:
+            raise AssertionError(result.stderr)
+        return result.stdout
+
+    def interrupt(self, cut: int, checkpoint_lines: int | None = None) -> None:
+        """Leave the output cut at byte ``cut``, optionally with a checkpoint after that many lines."""
+        self.output.write_bytes(self.expected[:cut])
+        checkpoint = Path(str(self.output) + ".ckpt")
+        checkpoint.unlink(missing_ok=True)
+        if checkpoint_lines is not None:
+            state = {
+                "input_offset": sum(map(len, self.input_lines[:checkpoint_lines])),
+                "output_offset": sum(map(len, self.records[:checkpoint_lines])),
+                "lines": checkpoint_lines,
+            }
+            checkpoint.write_text(json.dumps(state))
+
+    def assertResumes(self, *options):
+        stdout = self.run_inference("--resume", *options)
+        self.assertIn("Resuming after", stdout)
+        self.assertEqual(self.output.read_bytes(), self.expected)
+        self.assertFalse(Path(str(self.output) + ".ckpt").exists())
+        return stdout
+
+    def test_workers_match_single_process(self):
+        self.run_inference("-w", "2")
+        self.assertEqual(self.output.read_bytes(), self.expected)
+
+    def test_torn_record_is_repaired(self):
+        for workers in ("1", "2"):
+            for fraction in (0.3, 0.7):
+                with self.subTest(workers=workers, fraction=fraction):
+                    cut = int(len(self.expected) * fraction)
+                    self.assertNotEqual(self.expected[cut - 1 : cut], b"\n")
+                    self.interrupt(cut)
+                    self.assertIn("Repairing torn record", self.assertResumes("-w", workers))
+
+    def test_checkpoint_plus_later_records(self):
+        for workers in ("1", "2"):
+            with self.subTest(workers=workers):
+                # The checkpoint lags the output, which ends in a torn record.
+                self.interrupt(int(len(self.expected) * 0.6), checkpoint_lines=1500)
+                self.assertResumes("-w", workers)
+
+    def test_checkpoint_at_end_of_output(self):
+        for workers in ("1", "2"):
+            with self.subTest(workers=workers):
+                self.interrupt(sum(map(len, self.records[:4000])), checkpoint_lines=4000)
+                self.assertResumes("-w", workers)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,85 @@
+#!/usr/bin/env python3
+"""Tests for scripts/inference_cache.py."""
+from __future__ import annotations
+
+import sys
+import tempfile
+import unittest
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+from inference_cache import ResultCache  # noqa: E402
+
+
+class CountingModel:
+    def __init__(self):
+        self.seen: list[str] = []
+
+    def __call__(self, texts):
+        for text in texts:
+            self.seen.append(text)
+            yield text.upper()
+
+
+class TestResultCache(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.model_path = Path(self.tmp.name) / "model.gguf"
+        self.model_path.write_bytes(b"GGUF weights")
+        self.db_path = str(Path(self.tmp.name) / "cache.db")
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def _cache(self, max_bytes=1 << 20, params=None):
+        cache = ResultCache(self.db_path, max_bytes)
+        cache.bind(str(self.model_path), "system", params or {"temperature": 0.1})
+        return cache
+
+    def test_outputs_follow_input_order(self):
+        cache = self._cache()
+        outputs = list(cache.generate(["b", "a", "c"], CountingModel()))
+        self.assertEqual(outputs, ["B", "A", "C"])
+
+    def test_duplicates_generated_once(self):
+        cache = self._cache()
+        model = CountingModel()
+        outputs = list(cache.generate(["x", "y", "x", "x"], model))
+        self.assertEqual(outputs, ["X", "Y", "X", "X"])
+        self.assertEqual(model.seen, ["x", "y"])
+        self.assertEqual(cache.stats["cache_duplicates"], 2)
+
+    def test_hits_persist_across_instances(self):
+        list(self._cache().generate(["x"], CountingModel()))
+        cache = self._cache()
+        model = CountingModel()
+        self.assertEqual(list(cache.generate(["x", "y"], model)), ["X", "Y"])
+        self.assertEqual(model.seen, ["y"])
+        self.assertEqual(cache.stats["cache_hits"], 1)
+
+    def test_params_change_the_key(self):
+        list(self._cache().generate(["x"], CountingModel()))
+        model = CountingModel()
+        list(self._cache(params={"temperature": 0.0}).generate(["x"], model))
+        self.assertEqual(model.seen, ["x"])
+
+    def test_model_change_invalidates(self):
+        list(self._cache().generate(["x"], CountingModel()))
+        self.model_path.write_bytes(b"other GGUF weights")
+        model = CountingModel()
+        list(self._cache().generate(["x"], model))
+        self.assertEqual(model.seen, ["x"])
+
+    def test_lru_eviction_bounds_size(self):
+        cache = self._cache(max_bytes=10)
+        list(cache.generate(["aaaa", "bbbb"], CountingModel()))
+        cache.get_many([cache.key("aaaa")])  # touch so "bbbb" is least recently used
+        list(cache.generate(["cccc"], CountingModel()))
+        model = CountingModel()
+        list(cache.generate(["aaaa", "bbbb"], model))
+        self.assertEqual(model.seen, ["bbbb"])
+        self.assertGreater(cache.stats["cache_evictions"], 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,47 @@
+#!/usr/bin/env python3
+"""Tests for scripts/key_aliases.py."""
+from __future__ import annotations
+
+import sys
+import tempfile
+import unittest
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+from key_aliases import KeyAliases  # noqa: E402
+
+TARGETS = [
+    "timestamp 2024-01-28\nlevel INFO\nb x\n@ Started",
+    "timestamp 2024-01-29\nlevel WARN\nthread_id 7\n@ Slow",
+    "timestamp 2024-01-30\nlogger app\n@ Done",
+]
+
+
+class TestKeyAliases(unittest.TestCase):
+    def test_frequent_keys_get_unused_codes(self):
+        aliases = KeyAliases.build(TARGETS, min_count=2)
+        self.assertEqual(aliases.aliases, {"timestamp": "a", "level": "c"})
+
+    def test_round_trip(self):
+        aliases = KeyAliases.build(TARGETS)
+        for target in TARGETS:
+            encoded = aliases.encode(target)
+            self.assertNotIn("timestamp", encoded)
+            self.assertTrue(encoded.endswith(target.rsplit("\n", 1)[1]))
+            self.assertEqual(aliases.decode(encoded), target)
+
+    def test_save_and_load(self):
+        aliases = KeyAliases.build(TARGETS)
+        with tempfile.TemporaryDirectory() as tmp:
+            path = str(Path(tmp) / "aliases.json")
+            aliases.save(path)
+            self.assertEqual(KeyAliases.load(path).aliases, aliases.aliases)
+
+    def test_generate_restores_keys(self):
+        aliases = KeyAliases({"timestamp": "a"})
+        outputs = list(aliases.generate(["x"], lambda texts: ("a 1\nlevel 2" for _ in texts)))
+        self.assertEqual(outputs, ["timestamp 1\nlevel 2"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,71 @@
+#!/usr/bin/env python3
+"""Tests for scripts/key_generator.py."""
+from __future__ import annotations
+
+import re
+import subprocess
+import sys
+import unittest
+from pathlib import Path
+
+SCRIPTS = Path(__file__).resolve().parent
+sys.path.insert(0, str(SCRIPTS))
+from backends import Backend  # noqa: E402
+from key_generator import SEPARATOR, KeyGenerator, candidate_values  # noqa: E402
+
+
+class Lookup(Backend):
+    """Answers a prompt with the key written next to its value in the line."""
+
+    def __init__(self):
+        super().__init__()
+        self.calls = []
+
+    def generate_batch(self, texts):
+        self.calls.append(texts)
+        keys = []
+        for text in texts:
+            line, value = text.split(SEPARATOR)
+            match = re.search(rf"(\w+)=({re.escape(value)})\b", line)
+            keys.append(match[1] if match else "")
+        return keys
+
+
+class TestKeyGenerator(unittest.TestCase):
+    def test_twelve_fields_cost_one_call(self):
+        line = " ".join(f"k{i}=v{i}" for i in range(12))
+        backend = Lookup()
+        generator = KeyGenerator(backend, max_prompts=4)
+        target = next(generator.generate([(line, candidate_values(re.findall(r"=(\w+)", line)))]))
+        self.assertEqual(target, "\n".join(f"k{i} v{i}" for i in range(12)))
+        self.assertEqual(len(backend.calls), 1)
+        self.assertEqual(len(backend.calls[0]), 12)
+
+    def test_lines_packed_up_to_max_prompts_in_order(self):
+        backend = Lookup()
+        generator = KeyGenerator(backend, max_prompts=3)
+        items = [("a=1 b=2", ["1", "2"]), ("c=3", ["3"]), ("d=4 e=5", ["4", "5"]), ("nothing", [])]
+        self.assertEqual(list(generator.generate(items)), ["a 1\nb 2", "c 3", "d 4\ne 5", ""])
+        self.assertEqual([len(call) for call in backend.calls], [3, 2])
+
+    def test_candidate_values(self):
+        self.assertEqual(candidate_values(["0", "x", "0"]), ["0", "x"])
+        self.assertEqual(candidate_values("pid 42\nmsg a b\n@ summary"), ["42", "a b"])
+
+    def test_empty_key_drops_value(self):
+        generator = KeyGenerator(Lookup(), max_prompts=8)
+        self.assertEqual(list(generator.generate([("a=1 free", ["1", "free"])])), ["a 1"])
+        self.assertEqual(generator.stats["empty_keys"], 1)
+
+
+class TestMain(unittest.TestCase):
+    def test_chat_template_backends_are_rejected(self):
+        for backend in ("llama.cpp", "cascade", "transformers", "vllm"):
+            command = [sys.executable, str(SCRIPTS / "key_generator.py"), "-b", backend, "-m", "x", "-i", "in", "-o", "out"]
+            result = subprocess.run(command, capture_output=True, text=True, timeout=60)
+            self.assertEqual(result.returncode, 2)
+            self.assertIn(f"the {backend} backend formats prompts for the log parser", result.stderr)
+
+
+if __name__ == "__main__":
+    unittest.main()
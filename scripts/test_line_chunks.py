@@ -0,0 +1,69 @@
+#!/usr/bin/env python3
+"""Tests for scripts/line_chunks.py."""
+from __future__ import annotations
+
+import sys
+import unittest
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+from line_chunks import LineChunker  # noqa: E402
+
+
+def short(limit):
+    return lambda text: len(text) <= limit
+
+
+class TestSplit(unittest.TestCase):
+    def test_fitting_line_is_one_chunk(self):
+        self.assertEqual(LineChunker(short(100)).split("a b c"), [(0, 5)])
+
+    def test_splits_at_whitespace_and_covers_line(self):
+        line = "alpha beta gamma delta epsilon zeta"
+        spans = LineChunker(short(12), min_chunk=1).split(line)
+        chunks = [line[s:e] for s, e in spans]
+        self.assertTrue(all(len(c) <= 12 for c in chunks))
+        self.assertEqual(" ".join(chunks), line)
+
+    def test_punctuation_then_hard_split(self):
+        line = '{"a":1,"b":2,"c":3}'
+        chunks = [line[s:e] for s, e in LineChunker(short(8), min_chunk=1).split(line)]
+        self.assertEqual("".join(chunks), line)
+        self.assertTrue(chunks[0].endswith(","))
+        line = "x" * 10
+        chunks = [line[s:e] for s, e in LineChunker(short(4), min_chunk=1).split(line)]
+        self.assertEqual(chunks, ["xx", "xxx", "xx", "xxx"])
+
+    def test_context_too_small_raises_instead_of_fragmenting(self):
+        chunker = LineChunker(lambda text: False)
+        with self.assertRaisesRegex(ValueError, "raise --n-ctx or lower --max-tokens"):
+            chunker.split("2024-01-28 12:24:48 ERROR [763] worker-5 failed")
+        # Splitting stops at min_chunk characters.
+        line = "a" * 40 + " " + "b" * 40
+        self.assertEqual(LineChunker(short(60)).split(line), [(0, 40), (41, 81)])
+
+
+class TestMerge(unittest.TestCase):
+    def test_rules(self):
+        line = "ts=1 level=INFO msg=hello world"
+        chunker = LineChunker(short(100))
+        spans = [(0, 25), (26, 31)]  # split at the space inside "hello world"
+        outputs = [
+            "ts 1\nlevel INFO\nmsg hello\n@ First",
+            "level INFO\nts 2\nmsg world\n@ Second",
+        ]
+        merged = chunker.merge(line, spans, outputs)
+        self.assertEqual(merged, "ts 1\nlevel INFO\nmsg hello world\n@ First")
+        self.assertEqual(chunker.stats["chunk_conflicts"], 1)
+        self.assertEqual(chunker.stats["chunk_values_joined"], 1)
+
+    def test_generate_merges_per_line(self):
+        chunker = LineChunker(short(6), min_chunk=1)
+        lines = ["ab cd ef", "xy"]
+        outputs = list(chunker.generate(lines, lambda texts: (f"k{i} {t}" for i, t in enumerate(texts))))
+        self.assertEqual(outputs, ["k0 ab cd\nk1 ef", "k2 xy"])
+        self.assertEqual(chunker.stats["chunked_lines"], 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
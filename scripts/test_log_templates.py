@@ -0,0 +1,104 @@
+#!/usr/bin/env python3
+"""Tests for scripts/log_templates.py."""
+from __future__ import annotations
+
+import sys
+import unittest
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+from log_templates import TemplateMiner, template_of, tokenize, transfer  # noqa: E402
+
+REF_LINE = "2024-01-28 12:24:48 ERROR [763] worker-5 heartbeat failed"
+REF_OUTPUT = (
+    "timestamp 2024-01-28 12:24:48\n"
+    "level ERROR\n"
+    "process_id 763\n"
+    "thread worker-5\n"
+    "@ heartbeat failed"
+)
+
+
+class TestTemplates(unittest.TestCase):
+    def test_tokenize_is_lossless(self):
+        self.assertEqual("".join(tokenize(REF_LINE)), REF_LINE)
+
+    def test_variables_are_masked(self):
+        a = template_of(tokenize("pid=12 user=alice"))
+        b = template_of(tokenize("pid=907 user=alice"))
+        c = template_of(tokenize("pid=907 user=bob"))
+        self.assertEqual(a, b)
+        self.assertNotEqual(b, c)
+
+
+class TestTransfer(unittest.TestCase):
+    def test_values_follow_variable_positions(self):
+        new_line = "2024-02-03 01:02:03 ERROR [9911] worker-17 heartbeat failed"
+        self.assertEqual(
+            transfer(REF_LINE, REF_OUTPUT, new_line),
+            "timestamp 2024-02-03 01:02:03\n"
+            "level ERROR\n"
+            "process_id 9911\n"
+            "thread worker-17\n"
+            "@ heartbeat failed",
+        )
+
+    def test_different_template_fails(self):
+        self.assertIsNone(transfer(REF_LINE, REF_OUTPUT, "2024-02-03 01:02:03 INFO [1] worker-1 ok"))
+
+    def test_value_inside_variable_token_fails(self):
+        # "76" only exists as part of the variable token 763.
+        self.assertIsNone(transfer(REF_LINE, "pid_prefix 76", REF_LINE.replace("763", "999")))
+
+    def test_non_verbatim_value_with_changed_token_fails(self):
+        output = "timestamp 2024-01-28T12:24:48"
+        self.assertIsNone(transfer(REF_LINE, output, REF_LINE.replace("12:24:48", "13:00:00")))
+
+    def test_non_verbatim_summary_without_changed_token_is_kept(self):
+        output = "level ERROR\n@ heartbeat failure"
+        new_line = REF_LINE.replace("763", "999")
+        self.assertEqual(transfer(REF_LINE, output, new_line), output)
+
+    def test_non_verbatim_value_fails_when_line_changed(self):
+        # Unit split off the number: "5 ms" contains no changed token but is not re-readable.
+        self.assertIsNone(transfer("took 5ms", "duration 5 ms\n@ timing", "took 7ms"))
+        # Reworded value whose source token changed.
+        output = "code 500\nretries three\n@ request failed"
+        self.assertIsNone(transfer("ERROR code=500 retry=3", output, "ERROR code=404 retry=5"))
+        self.assertIsNone(transfer(REF_LINE, "level error", REF_LINE.replace("763", "999")))
+
+    def test_identical_line_keeps_any_value(self):
+        self.assertEqual(transfer("took 5ms", "duration 5 ms", "took 5ms"), "duration 5 ms")
+
+class TestTemplateMiner(unittest.TestCase):
+    def test_model_runs_once_per_template(self):
+        seen = []
+
+        def model(texts):
+            for text in texts:
+                seen.append(text)
+                yield "id " + text.split("=")[1]
+
+        miner = TemplateMiner()
+        lines = ["job id=1", "job id=22", "task id=3", "job id=4"]
+        self.assertEqual(list(miner.generate(lines, model)), ["id 1", "id 22", "id 3", "id 4"])
+        self.assertEqual(seen, ["job id=1", "task id=3"])
+        self.assertEqual(miner.stats["template_reused"], 2)
+
+    def test_alignment_failure_falls_back_to_model(self):
+        seen = []
+
+        def model(texts):
+            for text in texts:
+                seen.append(text)
+                yield "@ summary of " + text
+
+        miner = TemplateMiner()
+        outputs = list(miner.generate(["job id=1", "job id=2"], model))
+        self.assertEqual(outputs, ["@ summary of job id=1", "@ summary of job id=2"])
+        self.assertEqual(seen, ["job id=1", "job id=2"])
+        self.assertEqual(miner.stats["template_fallback"], 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
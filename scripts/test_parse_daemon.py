@@ -0,0 +1,42 @@
+#!/usr/bin/env python3
+"""Tests for scripts/parse_daemon.py and scripts/parse_client.py (mock backend)."""
+from __future__ import annotations
+
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+import unittest
+from pathlib import Path
+
+SCRIPTS = Path(__file__).resolve().parent
+
+
+class TestParseDaemon(unittest.TestCase):
+    def test_start_parse_and_idle_exit(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            sock = os.path.join(tmp, "parse.sock")
+            client = [sys.executable, str(SCRIPTS / "parse_client.py"), "--socket", sock]
+            daemon_args = ["--", "--backend", "mock", "--idle-timeout", "1"]
+
+            missing = subprocess.run([*client, "a=1"], capture_output=True, text=True)
+            self.assertNotEqual(missing.returncode, 0)
+
+            first = subprocess.run([*client, "--start", "a=1 b=2", *daemon_args], capture_output=True, text=True)
+            self.assertEqual(first.returncode, 0, first.stderr)
+            self.assertEqual(json.loads(first.stdout), {"input": "a=1 b=2", "predicted": "a 1\nb 2\n@ a=1 b=2"})
+
+            second = subprocess.run(client, input="x=1\n\ny: 2\n", capture_output=True, text=True)
+            records = [json.loads(line) for line in second.stdout.splitlines()]
+            self.assertEqual([r["input"] for r in records], ["x=1", "y: 2"])
+
+            deadline = time.monotonic() + 10
+            while os.path.exists(sock) and time.monotonic() < deadline:
+                time.sleep(0.1)
+            self.assertFalse(os.path.exists(sock))
+
+
+if __name__ == "__main__":
+    unittest.main()
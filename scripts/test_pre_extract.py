@@ -0,0 +1,132 @@
+#!/usr/bin/env python3
+"""Tests for scripts/pre_extract.py."""
+from __future__ import annotations
+
+import sys
+import unittest
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+from pre_extract import PreExtractor  # noqa: E402
+
+NGINX_ACCESS = '127.0.0.1 - frank [10/Oct/2000:13:55:36 -0700] "GET /a.gif HTTP/1.0" 200 2326 "-" "Mozilla/4.08"'
+
+
+class TestExtract(unittest.TestCase):
+    def setUp(self):
+        self.extractor = PreExtractor()
+
+    def assertExtracts(self, line, fields, remainder):
+        self.assertEqual(self.extractor.extract(line), (fields, remainder))
+
+    def test_syslog(self):
+        self.assertExtracts(
+            "Jan  1 00:00:00 host sshd[42]: Accepted publickey for bob",
+            [("timestamp", "Jan  1 00:00:00"), ("host", "host"), ("logger", "sshd"), ("process_id", "42")],
+            "Accepted publickey for bob",
+        )
+
+    def test_journald_short_iso(self):
+        self.assertExtracts(
+            "2024-01-01T12:00:00+0000 web01 systemd[1]: Started Session 3.",
+            [("timestamp", "2024-01-01T12:00:00+0000"), ("host", "web01"), ("logger", "systemd"), ("process_id", "1")],
+            "Started Session 3.",
+        )
+
+    def test_log4j(self):
+        self.assertExtracts(
+            "2024-01-01 12:00:00,123 [main] INFO  com.example.Foo - Started in 3s",
+            [
+                ("timestamp", "2024-01-01 12:00:00,123"),
+                ("thread_id", "main"),
+                ("level", "INFO"),
+                ("logger", "com.example.Foo"),
+            ],
+            "Started in 3s",
+        )
+
+    def test_nginx_error(self):
+        self.assertExtracts(
+            "2024/01/01 12:00:00 [error] 1234#5678: *42 open() failed",
+            [
+                ("timestamp", "2024/01/01 12:00:00"),
+                ("level", "error"),
+                ("process_id", "1234"),
+                ("thread_id", "5678"),
+                ("connection_id", "42"),
+            ],
+            "open() failed",
+        )
+
+    def test_iso8601(self):
+        self.assertExtracts(
+            "2024-01-28 12:24:48 ERROR [763] worker-5 heartbeat failed",
+            [("timestamp", "2024-01-28 12:24:48"), ("level", "ERROR"), ("process_id", "763")],
+            "worker-5 heartbeat failed",
+        )
+
+    def test_complete_format_needs_no_model(self):
+        fields, remainder = self.extractor.extract(NGINX_ACCESS)
+        self.assertIsNone(remainder)
+        self.assertIn(("status", "200"), fields)
+        self.assertNotIn("referer", dict(fields))  # "-" means absent
+        self.assertEqual(fields[-1], ("@", "GET /a.gif 200"))
+
+    def test_header_only_line_gets_a_summary(self):
+        self.assertExtracts(
+            "Jan  1 00:00:00 host sshd[1]:",
+            [("timestamp", "Jan  1 00:00:00"), ("host", "host"), ("logger", "sshd"), ("process_id", "1"), ("@", "sshd")],
+            None,
+        )
+        fields, _ = self.extractor.extract("2024-01-28 12:24:48 ")
+        self.assertEqual(fields[-1], ("@", "2024-01-28 12:24:48"))
+
+    def test_no_match(self):
+        self.assertIsNone(self.extractor.extract("user=bob action=login"))
+
+    def test_free_text_after_a_timestamp_is_left_to_the_model(self):
+        for line, timestamp, remainder in [
+            ("2024-01-28T12:24:48.123Z server listening: port 8080", "2024-01-28T12:24:48.123Z", "server listening: port 8080"),
+            ("2024-01-28T12:24:48Z app INFO: started worker", "2024-01-28T12:24:48Z", "app INFO: started worker"),
+            ("2024-01-28 12:24:48 Error count is 5", "2024-01-28 12:24:48", "Error count is 5"),
+        ]:
+            with self.subTest(line=line):
+                self.assertExtracts(line, [("timestamp", timestamp)], remainder)
+        self.assertIsNone(self.extractor.extract("Jan 12 10:00:00 Connection closed: by peer"))
+
+    def test_unambiguous_headers_without_pid(self):
+        self.assertExtracts(
+            "Jan  1 00:00:00 10.0.0.7 kernel: link up",
+            [("timestamp", "Jan  1 00:00:00"), ("host", "10.0.0.7"), ("logger", "kernel")],
+            "link up",
+        )
+        self.assertExtracts(
+            "2024-01-28 12:24:48 [error] disk full",
+            [("timestamp", "2024-01-28 12:24:48"), ("level", "error")],
+            "disk full",
+        )
+
+
+class TestGenerate(unittest.TestCase):
+    def test_model_sees_remainders_and_outputs_merge_in_order(self):
+        seen = []
+
+        def generate(texts):
+            for text in texts:
+                seen.append(text)
+                yield "level WARN\nuser bob\n@ login"
+
+        extractor = PreExtractor()
+        lines = ["2024-01-28 12:24:48 INFO user=bob", NGINX_ACCESS, "user=bob"]
+        outputs = list(extractor.generate(lines, generate))
+        self.assertEqual(seen, ["user=bob", "user=bob"])
+        self.assertEqual(outputs[0], "timestamp 2024-01-28 12:24:48\nlevel INFO\nuser bob\n@ login")
+        self.assertTrue(outputs[1].startswith("client_ip 127.0.0.1\n"))
+        self.assertEqual(outputs[2], "level WARN\nuser bob\n@ login")
+        self.assertEqual(extractor.stats["pre_extract_lines"], 3)
+        self.assertEqual(extractor.stats["pre_extract_matched"], 2)
+        self.assertEqual(extractor.stats["pre_extract_skipped"], 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,44 @@
+#!/usr/bin/env python3
+"""Tests for scripts/run_report.py."""
+from __future__ import annotations
+
+import json
+import sys
+import unittest
+from collections import Counter
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+from run_report import build_report, summarize  # noqa: E402
+
+
+class TestSummarize(unittest.TestCase):
+    def test_empty(self):
+        self.assertEqual(summarize([]), {})
+
+    def test_percentiles(self):
+        result = summarize([float(v) for v in range(100, 0, -1)])
+        self.assertEqual(result["p50"], 51.0)
+        self.assertEqual(result["p90"], 91.0)
+        self.assertEqual(result["p99"], 100.0)
+        self.assertEqual(result["mean"], 50.5)
+
+
+class TestBuildReport(unittest.TestCase):
+    def test_aggregates_and_serializes(self):
+        stats = Counter(prompt_tokens=30, cached_prompt_tokens=20, generated_tokens=40, cache_hits=1)
+        timings = {"latency_ms": [10.0, 20.0], "ttft_ms": [1.0, 2.0]}
+        report = build_report(3, 2.0, stats, timings, {"parallel": 8})
+        self.assertEqual(report["lines"], 3)
+        self.assertEqual(report["model_lines"], 2)
+        self.assertEqual(report["aggregate_decode_tokens_per_second"], 20.0)
+        self.assertEqual(report["latency_ms"]["p50"], 20.0)
+        self.assertEqual(report["decode_tokens_per_second"], {})
+        self.assertEqual(report["stats"]["cache_hits"], 1)
+        self.assertEqual(report["stage_hit_rates"], {"cache": 1.0})
+        self.assertGreater(report["peak_rss_mb"], 0)
+        json.dumps(report)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,61 @@
+#!/usr/bin/env python3
+"""Tests for scripts/backends/seq2seq.py, on a tiny random ByT5."""
+from __future__ import annotations
+
+import argparse
+import importlib.util
+import sys
+import tempfile
+import unittest
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+from test_export_onnx import LINES, tiny_byt5  # noqa: E402
+
+MORE_LINES = [*LINES, "x", "user=root action=login status=ok", "ERROR [763] worker-5 heartbeat failed", "e"]
+
+
+@unittest.skipUnless(all(importlib.util.find_spec(name) for name in ("torch", "transformers")), "needs torch and transformers")
+class TestSeq2SeqBackend(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.tmp = tempfile.TemporaryDirectory()
+        tiny_byt5(cls.tmp.name)
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.tmp.cleanup()
+
+    def test_dropping_finished_rows_matches_generate(self):
+        import torch
+        from transformers import AutoModelForSeq2SeqLM, AutoTokenizer
+
+        from backends import load_backend
+
+        tokenizer = AutoTokenizer.from_pretrained(self.tmp.name)
+        model = AutoModelForSeq2SeqLM.from_pretrained(self.tmp.name)
+        expected, steps = [], set()
+        with torch.no_grad():
+            for line in MORE_LINES:
+                generated = model.generate(**tokenizer(line, return_tensors="pt"), max_new_tokens=16, do_sample=False)
+                expected.append(tokenizer.decode(generated[0], skip_special_tokens=True))
+                steps.add(generated.shape[1])
+        self.assertGreater(len(steps), 1)  # rows finish at different steps
+
+        for parallel in (1, 2, 3, 8):
+            with self.subTest(parallel=parallel):
+                args = argparse.Namespace(
+                    backend="seq2seq", model=self.tmp.name, parallel=parallel, n_ctx=512, max_tokens=16,
+                    precision="fp32", grammar=False, kv_size=None, budget_ratio=None, fit_budget=None,
+                    compile=False, draft=0, temperature=0.1,
+                )
+                backend = load_backend(args)
+                self.assertEqual(list(backend.generate(MORE_LINES)), expected)
+                self.assertEqual(backend.generate_batch(MORE_LINES), expected)
+        args.temperature = 0.8
+        with self.assertRaisesRegex(ValueError, "--temperature not supported"):
+            load_backend(args)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,56 @@
+#!/usr/bin/env python3
+"""Tests for scripts/serve.py."""
+from __future__ import annotations
+
+import contextlib
+import io
+import sqlite3
+import sys
+import unittest
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+from run_report import summarize  # noqa: E402
+from serve import Batcher  # noqa: E402
+
+
+class TestBatcher(unittest.TestCase):
+    def test_errors_resolve_the_batch_and_keep_the_loop_running(self):
+        def generate(texts):
+            for text in texts:
+                if text == "locked":
+                    raise sqlite3.OperationalError("database is locked")
+                if text == "too long":
+                    raise ValueError("line does not fit the context")
+                yield text.upper()
+
+        batcher = Batcher(generate, [], max_batch=4, max_wait=0.01)
+        with contextlib.redirect_stderr(io.StringIO()):
+            failed = batcher.submit(["locked"])
+            self.assertTrue(failed.done.wait(5))
+            rejected = batcher.submit(["too long"])
+            self.assertTrue(rejected.done.wait(5))
+        self.assertEqual(failed.error, "OperationalError: database is locked")
+        self.assertTrue(failed.internal_error)
+        self.assertEqual(rejected.error, "line does not fit the context")
+        self.assertFalse(rejected.internal_error)
+
+        ok = batcher.submit(["a", "b"])
+        self.assertTrue(ok.done.wait(5))
+        self.assertEqual(ok.outputs, ["A", "B"])
+        self.assertIsNone(ok.error)
+
+    def test_metrics_use_the_run_report_percentiles(self):
+        batcher = Batcher(lambda texts: texts, [], max_batch=4, max_wait=0.01)
+        for ms in range(1, 101):
+            batcher.record(ms / 1000, 1)
+        metrics = batcher.metrics()
+        self.assertEqual(
+            {key: value for key, value in metrics.items() if key.startswith("latency_")},
+            {f"latency_{name}_ms": value for name, value in summarize(range(1, 101)).items()},
+        )
+        self.assertEqual(metrics["requests"], 100)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,70 @@
+#!/usr/bin/env python3
+"""Tests for scripts/span_pointers.py."""
+from __future__ import annotations
+
+import re
+import sys
+import unittest
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent
+sys.path.insert(0, str(ROOT))
+sys.path.insert(0, str(ROOT.parent / "evaluation" / "src"))
+from evaluation.parsing import parse_target  # noqa: E402
+from span_pointers import decode_target, encode_target, expand  # noqa: E402
+
+LINE = '2024-01-28 12:24:48 ERROR GET https://example.com/api/v1/items?id=989 took 12:34 ms'
+TARGET = "\n".join(
+    [
+        "timestamp 2024-01-28 12:24:48",
+        "level ERROR",
+        "url https://example.com/api/v1/items?id=989",
+        "duration 12:34",
+        "status 7:9",
+        "@ Request took long",
+    ]
+)
+
+
+class TestSpanPointers(unittest.TestCase):
+    def test_long_values_become_offsets(self):
+        encoded = encode_target(LINE, TARGET).split("\n")
+        self.assertEqual(encoded[0], "timestamp 0:19")
+        self.assertEqual(encoded[1], "level ERROR")  # too short to point at
+        self.assertEqual(encoded[2], "url 30:69")
+        self.assertEqual(encoded[-1], "@ Request took long")
+
+    def test_token_counts_decide(self):
+        def digit_tokens(text):  # one token per digit or other symbol, one per word
+            return len(re.findall(r"\d|[A-Za-z]+|[^\sA-Za-z\d]", text))
+
+        line = "connect localhost:8080 from com.example.billing.invoice.Client in 12ms"
+        target = "host localhost\nport 8080\nlogger com.example.billing.invoice.Client\n@ Connected"
+        encoded = encode_target(line, target, digit_tokens).split("\n")
+        self.assertEqual(encoded[0], "host localhost")  # 1 token; "8:17" would take 4
+        self.assertEqual(encoded[1], "port 8080")
+        self.assertEqual(encoded[2], "logger 28:62")  # 9 tokens for 5
+        # Without a tokenizer, the length floor keeps "localhost" literal too.
+        self.assertEqual(encode_target(line, target).split("\n"), encoded)
+
+    def test_literal_pointer_values_are_escaped(self):
+        encoded = encode_target(LINE, TARGET).split("\n")
+        self.assertEqual(encoded[4], "status \\7:9")
+
+    def test_round_trip_parses_like_the_original(self):
+        decoded = decode_target(LINE, encode_target(LINE, TARGET))
+        self.assertEqual(decoded, TARGET)
+        self.assertEqual(parse_target(decoded), parse_target(TARGET))
+
+    def test_out_of_range_pointer_is_kept(self):
+        self.assertEqual(decode_target("short", "key 2:400"), "key 2:400")
+
+    def test_expand_follows_input_order(self):
+        texts = [LINE, "abcdefghij"]
+        outputs = ["timestamp 0:19", "word 0:10"]
+        decoded = list(expand(texts, lambda it: (outputs[i] for i, _ in enumerate(it))))
+        self.assertEqual(decoded, ["timestamp 2024-01-28 12:24:48", "word abcdefghij"])
+
+
+if __name__ == "__main__":
+    unittest.main()
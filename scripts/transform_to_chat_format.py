@@ -5,6 +5,8 @@ import argparse
 import json
 import sys
 
+from key_aliases import KeyAliases
+
 
 def main():
     parser = argparse.ArgumentParser(
@@ -17,7 +19,12 @@ def main():
         required=True,
         help="System prompt to include in each conversation",
     )
+    parser.add_argument(
+        "--aliases",
+        help="Key alias table (from key_aliases.py) to shorten target keys with",
+    )
     args = parser.parse_args()
+    aliases = KeyAliases.load(args.aliases) if args.aliases else None
 
     with open(args.input) as fin, open(args.output, "w") as fout:
         for line_num, line in enumerate(fin, 1):
@@ -33,7 +40,10 @@ def main():
             messages = [
                 {"role": "system", "content": args.system_prompt},
                 {"role": "user", "content": entry["text"]},
-                {"role": "assistant", "content": entry["target"]},
+                {
+                    "role": "assistant",
+                    "content": aliases.encode(entry["target"]) if aliases else entry["target"],
+                },
             ]
             fout.write(json.dumps({"messages": messages}) + "\n")
 
@@ -0,0 +1,61 @@
+#!/usr/bin/env python3
+"""Rewrite the target of source/text/target JSONL into the span-pointer encoding."""
+
+import argparse
+import json
+import sys
+
+from span_pointers import MIN_POINTED_CHARS, encode_target
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Replace target values copied from text with start:end offsets."
+    )
+    parser.add_argument("input", help="Input JSONL file")
+    parser.add_argument("output", help="Output JSONL file")
+    parser.add_argument(
+        "--tokenizer",
+        help="Hugging Face tokenizer of the model to train (e.g. Qwen/Qwen3.5-0.8B). A value becomes a "
+        "pointer only if the pointer takes fewer of its tokens, and savings are reported in tokens. "
+        f"Without it, only values of at least {MIN_POINTED_CHARS} characters become pointers and "
+        "savings are reported in characters (exact for byte-level models such as ByT5).",
+    )
+    args = parser.parse_args()
+
+    if args.tokenizer:
+        from transformers import AutoTokenizer
+
+        tokenizer = AutoTokenizer.from_pretrained(args.tokenizer)
+
+        def count(text):
+            return len(tokenizer.encode(text, add_special_tokens=False))
+
+        count_tokens, unit = count, "tokens"
+    else:
+        count_tokens, unit = None, "characters"
+
+    before = after = 0
+    with open(args.input) as fin, open(args.output, "w") as fout:
+        for line_num, line in enumerate(fin, 1):
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                entry = json.loads(line)
+            except json.JSONDecodeError as e:
+                print(f"Skipping line {line_num}: {e}", file=sys.stderr)
+                continue
+
+            encoded = encode_target(entry["text"], entry["target"], count_tokens)
+            before += (count_tokens or len)(entry["target"])
+            after += (count_tokens or len)(encoded)
+            entry["target"] = encoded
+            fout.write(json.dumps(entry) + "\n")
+
+    if before:
+        print(f"Target {unit}: {before} -> {after} ({after / before:.1%})")
+
+
+if __name__ == "__main__":
+    main()